@@ -0,0 +1,146 @@
+"""Run the research pipeline over many topics.
+
+Topics come from a file or stdin: JSONL (``{"topic": ..., "id": ...}``
+per line), CSV (a ``topic`` column, optional ``id``) or plain text with
+one topic per line. Results are appended to a JSONL file as each topic
+finishes. Topics already recorded as ``ok`` in that file are skipped, so
+an interrupted batch picks up where it stopped and failed topics are
+retried.
+
+    python batch_run.py cohort.csv --output drafts.jsonl --concurrency 4
+    cat topics.txt | python batch_run.py - --output drafts.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from langgraph_flow import ResearchState, async_research_graph, skipped_nodes
+from utils.model_utils import aclose_async_clients
+from utils import telemetry
+
+# Fields of the final state written for each topic
+RESULT_FIELDS = ["idea", "lit_review", "structure", "drafts", "refine_errors", "final"]
+
+
+def read_topics(text: str, fmt: str = "auto") -> list:
+    """Parse topics into ``[{"id", "topic"}]``; the id defaults to the topic itself."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if fmt == "auto":
+        first = lines[0].lstrip() if lines else ""
+        if first.startswith(("{", '"')):
+            fmt = "jsonl"
+        elif "topic" in [name.strip().lower() for name in next(csv.reader([first]), [])]:
+            fmt = "csv"
+        else:
+            fmt = "text"
+
+    if fmt == "jsonl":
+        rows = [json.loads(line) for line in lines]
+        rows = [row if isinstance(row, dict) else {"topic": row} for row in rows]
+    elif fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        rows = [{(key or "").strip().lower(): (value or "").strip() for key, value in row.items()} for row in reader]
+    else:
+        rows = [{"topic": line.strip()} for line in lines]
+
+    topics = []
+    for row in rows:
+        topic = str(row.get("topic") or "").strip()
+        if topic:
+            topics.append({"id": str(row.get("id") or topic), "topic": topic})
+    return topics
+
+
+def finished_ids(output_path: str) -> set:
+    """Ids already written with status ``ok``."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted write
+                continue
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+async def run_batch(topics: list, output_path: str, concurrency: int = 2, max_workers: int = None) -> dict:
+    """Run every topic, appending one JSON line per result to ``output_path``."""
+    done = finished_ids(output_path)
+    pending = [item for item in topics if item["id"] not in done]
+    config = {"configurable": {"max_workers": max_workers}} if max_workers else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    summary = {"total": len(topics), "skipped": len(topics) - len(pending), "ok": 0, "failed": []}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def run_one(item):
+            async with semaphore:
+                topic_started = time.perf_counter()
+                record = {"id": item["id"], "topic": item["topic"]}
+                try:
+                    with telemetry.context(run=f"batch:{item['id']}"):
+                        state = await async_research_graph.ainvoke(ResearchState(topic=item["topic"]), config)
+                except Exception as e:
+                    record.update(status="error", error=f"{type(e).__name__}: {e}")
+                    summary["failed"].append(record)
+                else:
+                    record.update(status="ok", reused=skipped_nodes(state))
+                    record.update({field: state.get(field) for field in RESULT_FIELDS})
+                    summary["ok"] += 1
+                record["elapsed_s"] = round(time.perf_counter() - topic_started, 3)
+                write(record)
+                print(f"[{record['status']}] {item['topic']} ({record['elapsed_s']:.1f}s)", file=sys.stderr)
+
+        try:
+            await asyncio.gather(*(run_one(item) for item in pending))
+        finally:
+            await aclose_async_clients()
+
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    ran = summary["ok"] + len(summary["failed"])
+    summary["topics_per_min"] = round(ran / summary["elapsed_s"] * 60, 2) if ran and summary["elapsed_s"] else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="topics file, or - for stdin")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv", "text"], default="auto")
+    parser.add_argument("--concurrency", type=int, default=2, help="topics running at once")
+    parser.add_argument("--max-workers", type=int, help="LLM calls at once within a topic (default LLM_MAX_WORKERS)")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            text = f.read()
+    topics = read_topics(text, args.format)
+
+    summary = asyncio.run(run_batch(topics, args.output, args.concurrency, args.max_workers))
+    print(
+        f"\n{summary['total']} topics: {summary['ok']} done, {summary['skipped']} skipped, "
+        f"{len(summary['failed'])} failed in {summary['elapsed_s']:.1f}s ({summary['topics_per_min']} topics/min)"
+    )
+    for record in summary["failed"]:
+        print(f"  failed: {record['topic']}: {record['error']}")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""A local OpenAI-compatible ``/chat/completions`` server for offline benchmarks.
+
+Every request sleeps for a configurable latency, then either fails (500),
+is rate limited (429 with ``Retry-After``) or answers with a canned
+completion. ``"stream": true`` requests get the answer as SSE chunks.
+
+    python benchmarks/mock_llm.py --port 8011 --latency 0.2 --error-rate 0.05 --rate-limit-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOptions:
+    def __init__(self, latency=0.1, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, words=200, chunk_words=10, chunk_delay=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.words = words
+        self.chunk_words = chunk_words
+        self.chunk_delay = chunk_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def roll(self):
+        # (latency, outcome) for one request
+        with self.lock:
+            latency = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            r = self.random.random()
+        if r < self.error_rate:
+            return latency, "error"
+        if r < self.error_rate + self.rate_limit_rate:
+            return latency, "rate_limited"
+        return latency, "ok"
+
+
+def _completion_text(prompt: str, words: int) -> str:
+    # Deterministic per prompt so cached and uncached runs return the same text
+    seed = sum(prompt.encode("utf-8")) % 997
+    return " ".join(f"word{(seed + i) % 101}" for i in range(words))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options: MockOptions = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        options = self.options
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        options.count("requests")
+        latency, outcome = options.roll()
+        time.sleep(latency)
+        if outcome == "error":
+            options.count("errors")
+            self._json(500, {"error": {"message": "mock server error"}})
+            return
+        if outcome == "rate_limited":
+            options.count("rate_limited")
+            self._json(429, {"error": {"message": "mock rate limit"}}, {"Retry-After": str(options.retry_after)})
+            return
+
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        text = _completion_text(prompt, options.words)
+        usage = {
+            "prompt_tokens": len(prompt) // 4 + 1,
+            "completion_tokens": options.words,
+            "total_tokens": len(prompt) // 4 + 1 + options.words,
+        }
+        if body.get("stream"):
+            options.count("streams")
+            self._stream(body.get("model", "mock"), text)
+        else:
+            self._json(200, {
+                "id": "mock",
+                "object": "chat.completion",
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+        options.count("ok")
+
+    def _stream(self, model, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data):
+            line = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        words = text.split(" ")
+        step = max(1, self.options.chunk_words)
+        for start in range(0, len(words), step):
+            piece = " ".join(words[start:start + step]) + ("" if start + step >= len(words) else " ")
+            send(json.dumps({"model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}))
+            if self.options.chunk_delay:
+                time.sleep(self.options.chunk_delay)
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_server(options: MockOptions = None, host: str = "127.0.0.1", port: int = 0):
+    """Serve in a background thread; returns ``(server, base_url)``. Call ``server.shutdown()`` to stop."""
+    options = options or MockOptions()
+    handler = type("Handler", (_Handler,), {"options": options})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.options = options
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of uniform noise on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--words", type=int, default=200, help="words per completion")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    options = MockOptions(args.latency, args.jitter, args.error_rate, args.rate_limit_rate,
+                          args.retry_after, args.words, chunk_delay=args.chunk_delay)
+    server, base_url = start_server(options, args.host, args.port)
+    print(f"Mock LLM server at {base_url}; Ctrl-C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure cold and warm load time of Streamlit pages.
+
+Each page runs in a fresh interpreter through Streamlit's AppTest harness.
+The first run pays for every import the page triggers (cold); the
+following runs reuse the loaded modules, like a Streamlit rerun (warm).
+
+    python benchmarks/page_load.py pages/2_LitReviewAgent.py --runs 5 --output page_load.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+page, runs = sys.argv[1], int(sys.argv[2])
+timings = []
+for _ in range(runs):
+    at = AppTest.from_file(page, default_timeout=120)
+    at.session_state["user_email"] = "benchmark@example.com"
+    started = time.perf_counter()
+    at.run()
+    timings.append(time.perf_counter() - started)
+    if at.exception:
+        raise SystemExit(f"{page} raised: {at.exception[0].message}")
+print(json.dumps(timings))
+"""
+
+
+def measure(page: str, runs: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD, page, str(runs)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    warm = sorted(timings[1:]) or [timings[0]]
+    return {
+        "page": page,
+        "cold_s": round(timings[0], 4),
+        "warm_median_s": round(warm[len(warm) // 2], 4),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", default=["pages/2_LitReviewAgent.py"])
+    parser.add_argument("--runs", type=int, default=5, help="runs per page; the first is the cold one")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"timestamp": time.time(), "python": sys.version.split()[0], "pages": []}
+    for page in args.pages:
+        row = measure(page, max(2, args.runs))
+        results["pages"].append(row)
+        print(f"{page}: cold {row['cold_s']:.3f}s, warm {row['warm_median_s']:.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Offline benchmarks for the LLM client, the pipeline and the export paths.
+
+Starts the mock server from ``mock_llm.py``, points every provider at it
+and measures:
+
+- ``call_llm`` / ``acall_llm`` throughput and latency under concurrency
+- ``stream_llm`` time to first chunk and total time
+- ``research_graph`` and ``async_research_graph`` wall-clock time
+- PDF text extraction (in-process, and ``extract_many`` cold and cached)
+- DOCX export of a full set of drafts
+
+No network access or API keys are needed. Metrics are written as a flat
+JSON object so two runs can be compared:
+
+    python benchmarks/pipeline.py --output before.json
+    python benchmarks/pipeline.py --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Caches would turn repeated runs into lookups; measure the real paths.
+# Set before the modules below read them at import time.
+_TMP = tempfile.mkdtemp(prefix="ra-bench-")
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["NODE_CACHE_PATH"] = ""
+os.environ["PDF_TEXT_CACHE_DIR"] = os.path.join(_TMP, "pdf_text")
+os.environ["TELEMETRY_PATH"] = os.path.join(_TMP, "telemetry.jsonl")
+
+from mock_llm import MockOptions, start_server  # noqa: E402
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_metrics(prefix: str, latencies: list, elapsed: float, failures: int) -> dict:
+    return {
+        f"{prefix}.calls": len(latencies) + failures,
+        f"{prefix}.failures": failures,
+        f"{prefix}.throughput_per_s": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        f"{prefix}.latency_p50_s": round(percentile(latencies, 0.5), 4),
+        f"{prefix}.latency_p95_s": round(percentile(latencies, 0.95), 4),
+        f"{prefix}.latency_max_s": round(max(latencies, default=0.0), 4),
+    }
+
+
+def use_mock_providers(base_url: str, count: int = 2, rpm: int = 0, tpm: int = 0):
+    """Replace the configured providers with ``count`` models on the mock server."""
+    from utils import llm_config
+
+    llm_config.set_providers([
+        {
+            "name": f"Mock{i}",
+            "base_url": base_url,
+            "headers": lambda token: {"Authorization": f"Bearer {token}"},
+            "token": "mock",
+            "model": f"mock-model-{i}",
+            "rpm": rpm,
+            "tpm": tpm,
+        }
+        for i in range(count)
+    ])
+
+
+def bench_call_llm(calls: int, concurrency: int) -> dict:
+    from utils.concurrency import map_bounded
+    from utils.model_utils import call_llm
+
+    def one(i):
+        started = time.perf_counter()
+        call_llm(f"benchmark prompt {i}", use_cache=False)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = map_bounded(one, range(calls), max_workers=concurrency, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    latencies = [r for r in results if not isinstance(r, Exception)]
+    return latency_metrics("call_llm", latencies, elapsed, len(results) - len(latencies))
+
+
+def bench_acall_llm(calls: int, concurrency: int) -> dict:
+    from utils.concurrency import amap_bounded
+    from utils.model_utils import acall_llm, aclose_async_clients
+
+    async def one(i):
+        started = time.perf_counter()
+        await acall_llm(f"async benchmark prompt {i}", use_cache=False)
+        return time.perf_counter() - started
+
+    async def run():
+        try:
+            return await amap_bounded(one, range(calls), max_workers=concurrency, return_exceptions=True)
+        finally:
+            await aclose_async_clients()
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    latencies = [r for r in results if not isinstance(r, Exception)]
+    return latency_metrics("acall_llm", latencies, elapsed, len(results) - len(latencies))
+
+
+def bench_stream_llm(calls: int) -> dict:
+    from utils.model_utils import stream_llm
+
+    first_chunk, totals, failures = [], [], 0
+    for i in range(calls):
+        started = time.perf_counter()
+        try:
+            for n, _ in enumerate(stream_llm(f"stream benchmark prompt {i}", use_cache=False)):
+                if n == 0:
+                    first_chunk.append(time.perf_counter() - started)
+        except Exception:
+            failures += 1
+            continue
+        totals.append(time.perf_counter() - started)
+    return {
+        "stream_llm.calls": calls,
+        "stream_llm.failures": failures,
+        "stream_llm.first_chunk_p50_s": round(percentile(first_chunk, 0.5), 4),
+        "stream_llm.total_p50_s": round(percentile(totals, 0.5), 4),
+    }
+
+
+def bench_graph(runs: int) -> dict:
+    from langgraph_flow import ResearchState, research_graph, async_research_graph
+    from utils.model_utils import aclose_async_clients
+
+    async def arun(topic):
+        try:
+            return await async_research_graph.ainvoke(ResearchState(topic=topic))
+        finally:
+            await aclose_async_clients()
+
+    metrics = {}
+    for name, run in [
+        ("research_graph", lambda topic: research_graph.invoke(ResearchState(topic=topic))),
+        ("async_research_graph", lambda topic: asyncio.run(arun(topic))),
+    ]:
+        timings, failures = [], 0
+        for i in range(runs):
+            started = time.perf_counter()
+            try:
+                run(f"{name} benchmark topic {i}")
+            except Exception:
+                failures += 1
+                continue
+            timings.append(time.perf_counter() - started)
+        metrics[f"{name}.runs"] = runs
+        metrics[f"{name}.failures"] = failures
+        metrics[f"{name}.wall_p50_s"] = round(percentile(timings, 0.5), 4)
+        metrics[f"{name}.wall_max_s"] = round(max(timings, default=0.0), 4)
+    return metrics
+
+
+def _sample_pdf(pages: int) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    line = "Consumers report higher trust when brands disclose sponsored content. " * 2
+    for p in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"Page {p + 1}\n" + line * 20, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def bench_pdf(pages: int, files: int) -> dict:
+    from utils.pdf_utils import extract_many, extract_text
+
+    # Distinct files so extract_many can't dedupe them
+    blobs = [_sample_pdf(pages + i) for i in range(files)]
+    started = time.perf_counter()
+    for blob in blobs:
+        extract_text(blob)
+    inline = time.perf_counter() - started
+
+    started = time.perf_counter()
+    extract_many(blobs)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    extract_many(blobs)
+    warm = time.perf_counter() - started
+    return {
+        "pdf.files": files,
+        "pdf.pages_per_file": pages,
+        "pdf.extract_text_total_s": round(inline, 4),
+        "pdf.extract_many_cold_s": round(cold, 4),
+        "pdf.extract_many_cached_s": round(warm, 4),
+    }
+
+
+def bench_docx(runs: int, words: int) -> dict:
+    from langgraph_flow import SECTIONS
+    from utils.docx_export import save_docx
+
+    paragraph = " ".join(["Trust in social media advertising depends on disclosure."] * (words // 8))
+    drafts = {section: paragraph for section in SECTIONS}
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        save_docx(drafts, "benchmark_draft", {SECTIONS[0]: "Check the framing."})
+        timings.append(time.perf_counter() - started)
+    return {
+        "docx.runs": runs,
+        "docx.words_per_section": words,
+        "docx.export_p50_s": round(percentile(timings, 0.5), 4),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(metrics: dict, baseline: dict):
+    for name, value in metrics.items():
+        old = baseline.get(name)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+            continue
+        print(f"{name:40s} {old:>10} -> {value:>10} ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--rpm", type=int, default=0, help="requests/minute limit per mock provider (0 = none)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens/minute limit per mock provider (0 = none)")
+    parser.add_argument("--hedge", action="store_true", help="hedge slow call_llm requests (LLM_HEDGE=1)")
+    parser.add_argument("--calls", type=int, default=200, help="call_llm/acall_llm calls")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--graph-runs", type=int, default=3)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--pdf-files", type=int, default=4)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["llm", "stream", "graph", "pdf", "docx"])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    if args.hedge:
+        # Read when utils.model_utils is first imported, inside the benchmarks
+        os.environ["LLM_HEDGE"] = "1"
+    options = MockOptions(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, retry_after=0, seed=0)
+    server, base_url = start_server(options)
+    use_mock_providers(base_url, rpm=args.rpm, tpm=args.tpm)
+
+    metrics = {}
+    try:
+        if "llm" not in args.skip:
+            metrics.update(bench_call_llm(args.calls, args.concurrency))
+            metrics.update(bench_acall_llm(args.calls, args.concurrency))
+        if "stream" not in args.skip:
+            metrics.update(bench_stream_llm(max(1, args.calls // 10)))
+        if "graph" not in args.skip:
+            metrics.update(bench_graph(args.graph_runs))
+        if "pdf" not in args.skip:
+            metrics.update(bench_pdf(args.pdf_pages, args.pdf_files))
+        if "docx" not in args.skip:
+            metrics.update(bench_docx(5, 1000))
+    finally:
+        server.shutdown()
+    metrics.update({f"mock.{name}": value for name, value in options.counts.items()})
+    from utils.model_utils import get_coalesce_stats, get_hedge_stats, get_rate_limit_stats
+    metrics["coalesced_calls"] = get_coalesce_stats()["coalesced"]
+    hedges = get_hedge_stats()
+    metrics["hedge.fired"] = hedges["hedges_fired"]
+    metrics["hedge.won"] = hedges["hedges_won"]
+    metrics["hedge.denied"] = hedges["hedges_denied"]
+    for row in get_rate_limit_stats():
+        if row["rpm"] or row["tpm"]:
+            metrics[f"rate_limit.{row['provider']}.waits"] = row["waits"]
+            metrics[f"rate_limit.{row['provider']}.max_wait_s"] = row["max_wait_s"]
+            metrics[f"rate_limit.{row['provider']}.timeouts"] = row["timeouts"]
+
+    results = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "commit": _git_commit(),
+        "mock": {"latency": args.latency, "jitter": args.jitter,
+                 "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate,
+                 "rpm": args.rpm, "tpm": args.tpm, "hedge": args.hedge},
+        "metrics": metrics,
+    }
+    for name, value in metrics.items():
+        print(f"{name:40s} {value}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(f"\nChange against {args.baseline}:")
+            compare(metrics, json.load(f)["metrics"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
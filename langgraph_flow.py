@@ -1,6 +1,26 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict
-from utils.model_utils import call_llm
+import asyncio
+import inspect
+import json
+import operator
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from typing import Annotated, TypedDict
+from utils.model_utils import call_llm, acall_llm, aclose_async_clients
+from utils.llm_cache import ResponseCache, make_key
+from utils.concurrency import map_bounded, amap_bounded, DEFAULT_MAX_WORKERS
+from utils.summarize import estimate_tokens
+from utils import telemetry
+from utils.llm_config import setting
+
+# Paper sections, in the order they appear in the final document
+SECTIONS = ["Introduction", "Literature Review", "Methodology", "Results", "Discussion", "Conclusion"]
 
 # === Shared memory for the graph ===
 class ResearchState(TypedDict):
@@ -9,12 +29,18 @@ class ResearchState(TypedDict):
     lit_review: str
     structure: str
     drafts: dict
+    refine_errors: dict
     final: str
+    # Fields supplied by the caller that must not be regenerated, e.g. ["structure"]
+    pinned: list
+    # One {"node", "status"} entry per node run: computed, cached or pinned
+    node_report: Annotated[list, operator.add]
+    # One entry per node that called the LLM: prompt count, size and shared prefix
+    prompt_sizes: Annotated[list, operator.add]
 
-# === Step functions representing each agent ===
-def idea_agent(state: ResearchState) -> ResearchState:
-    topic = state.get("topic", "")
-    prompt = f"""You are an academic research assistant helping to define a research project.
+# === Prompts (shared by the sync and async agents) ===
+def idea_prompt(topic: str) -> str:
+    return f"""You are an academic research assistant helping to define a research project.
 
 Based on the topic: "{topic}", generate the following:
 - 2–3 possible research questions
@@ -25,19 +51,12 @@ Based on the topic: "{topic}", generate the following:
 
 Use clear, formal language.
 """
-    idea = call_llm(prompt).strip()
-    return {**state, "idea": idea}
 
-def lit_review_agent(state: ResearchState) -> ResearchState:
-    topic = state.get("topic", "")
-    prompt = f"""You are an academic assistant. Summarize the current literature relevant to the topic: '{topic}' in 5–7 sentences."""
-    lit_review = call_llm(prompt).strip()
-    return {**state, "lit_review": lit_review}
+def lit_review_prompt(topic: str) -> str:
+    return f"""You are an academic assistant. Summarize the current literature relevant to the topic: '{topic}' in 5–7 sentences."""
 
-def structure_agent(state: ResearchState) -> ResearchState:
-    idea = state.get("idea", "")
-    lit_review = state.get("lit_review", "")
-    prompt = f"""Based on the following research idea and literature review, develop a detailed outline for a research paper.
+def structure_prompt(idea: str, lit_review: str) -> str:
+    return f"""Based on the following research idea and literature review, develop a detailed outline for a research paper.
 
 Research Idea:
 {idea}
@@ -57,75 +76,484 @@ For each section, provide key points or subheadings that should be addressed.
 
 Use clear, formal language.
 """
-    structure = call_llm(prompt).strip()
-    return {**state, "structure": structure}
 
-def writing_agent(state: ResearchState) -> ResearchState:
-    structure = state.get("structure", "")
-    lit_review = state.get("lit_review", "")
-    drafts = {}
-    sections = ["Introduction", "Literature Review", "Methodology", "Results", "Discussion", "Conclusion"]
-    for section in sections:
-        prompt = f"""You are an academic research assistant tasked with drafting the '{section}' section of a research paper.
+def _heading_section(line: str):
+    # "2. Literature Review", "## II. Methodology:", "**Results**" -> section name
+    line = line.strip()
+    if re.match(r"[-*+]\s", line):
+        # A bullet point inside a section, not a heading
+        return None
+    # A numeral only counts when "." or ")" and a space follow, so the "I" of "Introduction" stays
+    text = re.sub(r"^[#*\s]*(?:(?:[0-9]+|[IVX]+)[.)]\s+)?", "", line).strip("*:# ").lower()
+    for section in SECTIONS:
+        if text.startswith(section.lower()):
+            return section
+    return None
 
-Based on the following structure and literature review:
+def section_outline(structure: str, section: str) -> str:
+    """The part of ``structure`` that outlines ``section``, or all of it if not found."""
+    lines = structure.splitlines()
+    start = None
+    for i, line in enumerate(lines):
+        heading = _heading_section(line)
+        if start is None and heading == section:
+            start = i
+        elif start is not None and heading is not None and heading != section:
+            return "\n".join(lines[start:i]).strip()
+    return "\n".join(lines[start:]).strip() if start is not None else structure
 
-Structure:
-{structure}
+def writing_prompt(section: str, structure: str, lit_review: str) -> str:
+    # Shared context comes first and is identical for every section, so
+    # providers can reuse a cached prompt prefix; section-specific text is last.
+    return f"""You are an academic research assistant drafting a research paper one section at a time.
 
 Literature Review:
 {lit_review}
 
+Outline for this section:
+{section_outline(structure, section)}
+
 Draft the '{section}' section with appropriate content and depth.
 
 Use formal academic language.
 """
-        draft = call_llm(prompt).strip()
-        drafts[section] = draft
-    return {**state, "drafts": drafts}
 
-def refine_agent(state: ResearchState) -> ResearchState:
-    drafts = state.get("drafts", {})
-    refined_drafts = {}
-    for section, content in drafts.items():
-        prompt = f"""You are an academic editor. Please refine the following draft of the '{section}' section to improve clarity, coherence, and academic rigor.
+def refine_prompt(section: str, content: str) -> str:
+    return f"""You are an academic editor. Please refine the following draft of the '{section}' section to improve clarity, coherence, and academic rigor.
 
 Draft:
 {content}
 
 Provide the refined version below:
 """
-        refined_draft = call_llm(prompt).strip()
-        refined_drafts[section] = refined_draft
-    return {**state, "drafts": refined_drafts}
+
+def _max_workers(config) -> int:
+    # Concurrency limit for per-section LLM calls, set per run via
+    # research_graph.invoke(state, config={"configurable": {"max_workers": 3}})
+    configurable = (config or {}).get("configurable", {})
+    return int(configurable.get("max_workers", DEFAULT_MAX_WORKERS))
+
+def report_progress(**event):
+    """Emit a progress event to a run streamed with stream_mode="custom"; otherwise a no-op."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run, e.g. an agent invoked directly
+        return
+    writer(event)
+
+def prompt_usage(node: str, prompts: list) -> ResearchState:
+    """Size accounting for the prompts a node sent, merged into its output."""
+    prompts = list(prompts)
+    shared = os.path.commonprefix(prompts) if len(prompts) > 1 else ""
+    return {"prompt_sizes": [{
+        "node": node,
+        "calls": len(prompts),
+        "chars": sum(len(prompt) for prompt in prompts),
+        "tokens_est": sum(estimate_tokens(prompt) for prompt in prompts),
+        "shared_prefix_tokens_est": estimate_tokens(shared) if shared else 0,
+    }]}
+
+def _merge_refined(drafts: dict, results: list) -> ResearchState:
+    # A failed section keeps its unrefined draft; the error is reported alongside
+    refined_drafts = {}
+    refine_errors = {}
+    for (section, content), result in zip(drafts.items(), results):
+        if isinstance(result, Exception):
+            print(f"[⚠️ Refine Fail] {section}: {result}")
+            refined_drafts[section] = content
+            refine_errors[section] = str(result)
+        else:
+            refined_drafts[section] = result
+    return {"drafts": refined_drafts, "refine_errors": refine_errors}
+
+# === Step functions representing each agent ===
+# Each agent returns only the fields it produces, so IdeaAgent and
+# LitReviewAgent can run in the same step without clobbering each other.
+def idea_agent(state: ResearchState) -> ResearchState:
+    prompt = idea_prompt(state.get("topic", ""))
+    idea = call_llm(prompt).strip()
+    return {"idea": idea, **prompt_usage("IdeaAgent", [prompt])}
+
+def lit_review_agent(state: ResearchState) -> ResearchState:
+    prompt = lit_review_prompt(state.get("topic", ""))
+    lit_review = call_llm(prompt).strip()
+    return {"lit_review": lit_review, **prompt_usage("LitReviewAgent", [prompt])}
+
+def structure_agent(state: ResearchState) -> ResearchState:
+    prompt = structure_prompt(state.get("idea", ""), state.get("lit_review", ""))
+    structure = call_llm(prompt).strip()
+    return {"structure": structure, **prompt_usage("StructureAgent", [prompt])}
+
+def writing_agent(state: ResearchState, config=None) -> ResearchState:
+    structure = state.get("structure", "")
+    lit_review = state.get("lit_review", "")
+    prompts = [writing_prompt(section, structure, lit_review) for section in SECTIONS]
+
+    def draft_section(item):
+        section, prompt = item
+        draft = call_llm(prompt).strip()
+        report_progress(node="WritingAgent", section=section, text=draft)
+        return draft
+
+    # Sections are drafted concurrently; map_bounded joins them back in SECTIONS order
+    results = map_bounded(draft_section, zip(SECTIONS, prompts), max_workers=_max_workers(config))
+    return {"drafts": dict(zip(SECTIONS, results)), **prompt_usage("WritingAgent", prompts)}
+
+def refine_agent(state: ResearchState, config=None) -> ResearchState:
+    drafts = state.get("drafts", {})
+    prompts = [refine_prompt(section, content) for section, content in drafts.items()]
+
+    def refine_section(item):
+        section, prompt = item
+        refined = call_llm(prompt).strip()
+        report_progress(node="RefineAgent", section=section, text=refined)
+        return refined
+
+    results = map_bounded(refine_section, zip(drafts, prompts), max_workers=_max_workers(config), return_exceptions=True)
+    return {**_merge_refined(drafts, results), **prompt_usage("RefineAgent", prompts)}
 
 def export_agent(state: ResearchState) -> ResearchState:
     final_text = "\n\n".join([f"{section}\n{content}" for section, content in state["drafts"].items()])
-    return {**state, "final": final_text}
+    return {"final": final_text}
+
+# === Async agents, for running the graph with ainvoke/astream ===
+async def aidea_agent(state: ResearchState) -> ResearchState:
+    prompt = idea_prompt(state.get("topic", ""))
+    idea = (await acall_llm(prompt)).strip()
+    return {"idea": idea, **prompt_usage("IdeaAgent", [prompt])}
+
+async def alit_review_agent(state: ResearchState) -> ResearchState:
+    prompt = lit_review_prompt(state.get("topic", ""))
+    lit_review = (await acall_llm(prompt)).strip()
+    return {"lit_review": lit_review, **prompt_usage("LitReviewAgent", [prompt])}
+
+async def astructure_agent(state: ResearchState) -> ResearchState:
+    prompt = structure_prompt(state.get("idea", ""), state.get("lit_review", ""))
+    structure = (await acall_llm(prompt)).strip()
+    return {"structure": structure, **prompt_usage("StructureAgent", [prompt])}
+
+async def awriting_agent(state: ResearchState, config=None) -> ResearchState:
+    structure = state.get("structure", "")
+    lit_review = state.get("lit_review", "")
+    prompts = [writing_prompt(section, structure, lit_review) for section in SECTIONS]
+
+    async def draft_section(item):
+        section, prompt = item
+        draft = (await acall_llm(prompt)).strip()
+        report_progress(node="WritingAgent", section=section, text=draft)
+        return draft
+
+    results = await amap_bounded(draft_section, zip(SECTIONS, prompts), max_workers=_max_workers(config))
+    return {"drafts": dict(zip(SECTIONS, results)), **prompt_usage("WritingAgent", prompts)}
+
+async def arefine_agent(state: ResearchState, config=None) -> ResearchState:
+    drafts = state.get("drafts", {})
+    prompts = [refine_prompt(section, content) for section, content in drafts.items()]
+
+    async def refine_section(item):
+        section, prompt = item
+        refined = (await acall_llm(prompt)).strip()
+        report_progress(node="RefineAgent", section=section, text=refined)
+        return refined
+
+    results = await amap_bounded(refine_section, zip(drafts, prompts), max_workers=_max_workers(config), return_exceptions=True)
+    return {**_merge_refined(drafts, results), **prompt_usage("RefineAgent", prompts)}
+
+async def aexport_agent(state: ResearchState) -> ResearchState:
+    return export_agent(state)
+
+# === Incremental recomputation: memoize each node on the fields it reads ===
+# Node name -> (state fields it reads, field it produces that a caller may pin)
+NODE_INPUTS = {
+    "IdeaAgent": (["topic"], "idea"),
+    "LitReviewAgent": (["topic"], "lit_review"),
+    "StructureAgent": (["idea", "lit_review"], "structure"),
+    "WritingAgent": (["structure", "lit_review"], "drafts"),
+    "RefineAgent": (["drafts"], None),
+    "ExportAgent": (["drafts"], None),
+}
+
+# Bump when prompts change so memoized node outputs are recomputed
+NODE_CACHE_VERSION = "v3"
+# Set NODE_CACHE_PATH to an empty string to disable node memoization
+NODE_CACHE_PATH = setting("NODE_CACHE_PATH", ".cache/node_outputs.sqlite")
+
+_node_cache = None
+_node_cache_lock = threading.Lock()
+
+def get_node_cache():
+    global _node_cache
+    with _node_cache_lock:
+        if _node_cache is None and NODE_CACHE_PATH:
+            _node_cache = ResponseCache(NODE_CACHE_PATH, ttl=0)
+    return _node_cache
+
+@contextmanager
+def _node_span(name: str, config):
+    # Telemetry span for one node; LLM calls made inside are tagged with the
+    # node and run (the checkpoint thread id unless the caller set one)
+    run = telemetry.current("run") or (config or {}).get("configurable", {}).get("thread_id")
+    report_progress(node=name, event="start")
+    started = time.perf_counter()
+    span = {}
+    try:
+        with telemetry.context(run=run, node=name), telemetry.span("node", name) as span:
+            yield span
+    finally:
+        report_progress(node=name, event="end", status=span.get("status", "error"),
+                        outcome=span.get("outcome"), duration_s=round(time.perf_counter() - started, 3))
+
+def memoize_node(name: str, agent):
+    """Wrap ``agent`` so it is skipped when the fields it reads are unchanged.
+
+    The output is stored under a hash of exactly the NODE_INPUTS fields for
+    ``name``. A node whose output field is listed in ``state["pinned"]``
+    keeps the caller's value. Pass ``{"configurable": {"force_recompute":
+    True}}`` to ignore stored outputs for a run.
+    """
+    reads, produces = NODE_INPUTS[name]
+    takes_config = "config" in inspect.signature(agent).parameters
+
+    def before(state, config):
+        if produces and produces in (state.get("pinned") or []) and state.get(produces):
+            return None, {"node_report": [{"node": name, "status": "pinned"}]}
+        cache = get_node_cache()
+        if cache is None:
+            return None, None
+        key = make_key("node", name, NODE_CACHE_VERSION, {field: state.get(field) for field in reads})
+        if not (config or {}).get("configurable", {}).get("force_recompute"):
+            cached = cache.get(key)
+            if cached is not None:
+                return key, {**json.loads(cached), "node_report": [{"node": name, "status": "cached"}]}
+        return key, None
+
+    def after(key, output):
+        # Runs with failed refinements aren't stored, so they are retried next time
+        if key is not None and not output.get("refine_errors"):
+            stored = {field: value for field, value in output.items() if field not in ("node_report", "prompt_sizes")}
+            get_node_cache().set(key, json.dumps(stored))
+        return {**output, "node_report": [{"node": name, "status": "computed"}]}
+
+    if inspect.iscoroutinefunction(agent):
+        async def wrapper(state, config=None):
+            with _node_span(name, config) as span:
+                key, skipped = before(state, config)
+                if skipped is not None:
+                    span["outcome"] = skipped["node_report"][0]["status"]
+                    return skipped
+                output = await (agent(state, config) if takes_config else agent(state))
+                span["outcome"] = "computed"
+                return after(key, output)
+    else:
+        def wrapper(state, config=None):
+            with _node_span(name, config) as span:
+                key, skipped = before(state, config)
+                if skipped is not None:
+                    span["outcome"] = skipped["node_report"][0]["status"]
+                    return skipped
+                output = agent(state, config) if takes_config else agent(state)
+                span["outcome"] = "computed"
+                return after(key, output)
+    # No functools.wraps: langgraph reads the signature, and the wrapper
+    # must always receive config even when the agent doesn't take it
+    wrapper.__name__ = agent.__name__
+    return wrapper
+
+def skipped_nodes(state) -> list:
+    """Names of the nodes a run reused (cached) or kept (pinned) instead of recomputing."""
+    return [entry["node"] for entry in state.get("node_report", []) if entry["status"] != "computed"]
 
 # === Build LangGraph ===
-workflow = StateGraph(ResearchState)
-
-workflow.add_node("IdeaAgent", idea_agent)
-workflow.add_node("LitReviewAgent", lit_review_agent)
-workflow.add_node("StructureAgent", structure_agent)
-workflow.add_node("WritingAgent", writing_agent)
-workflow.add_node("RefineAgent", refine_agent)
-workflow.add_node("ExportAgent", export_agent)
-
-workflow.set_entry_point("IdeaAgent")
-workflow.add_edge("IdeaAgent", "LitReviewAgent")
-workflow.add_edge("LitReviewAgent", "StructureAgent")
-workflow.add_edge("StructureAgent", "WritingAgent")
-workflow.add_edge("WritingAgent", "RefineAgent")
-workflow.add_edge("RefineAgent", "ExportAgent")
-workflow.add_edge("ExportAgent", END)
+def build_workflow(agents: dict) -> StateGraph:
+    workflow = StateGraph(ResearchState)
+
+    workflow.add_node("IdeaAgent", memoize_node("IdeaAgent", agents["idea"]))
+    workflow.add_node("LitReviewAgent", memoize_node("LitReviewAgent", agents["lit_review"]))
+    workflow.add_node("StructureAgent", memoize_node("StructureAgent", agents["structure"]))
+    workflow.add_node("WritingAgent", memoize_node("WritingAgent", agents["writing"]))
+    workflow.add_node("RefineAgent", memoize_node("RefineAgent", agents["refine"]))
+    workflow.add_node("ExportAgent", memoize_node("ExportAgent", agents["export"]))
+
+    # The literature review only needs the topic, so it runs alongside IdeaAgent
+    workflow.add_edge(START, "IdeaAgent")
+    workflow.add_edge(START, "LitReviewAgent")
+    workflow.add_edge(["IdeaAgent", "LitReviewAgent"], "StructureAgent")
+    workflow.add_edge("StructureAgent", "WritingAgent")
+    workflow.add_edge("WritingAgent", "RefineAgent")
+    workflow.add_edge("RefineAgent", "ExportAgent")
+    workflow.add_edge("ExportAgent", END)
+    return workflow
+
+SYNC_AGENTS = {
+    "idea": idea_agent,
+    "lit_review": lit_review_agent,
+    "structure": structure_agent,
+    "writing": writing_agent,
+    "refine": refine_agent,
+    "export": export_agent,
+}
+
+ASYNC_AGENTS = {
+    "idea": aidea_agent,
+    "lit_review": alit_review_agent,
+    "structure": astructure_agent,
+    "writing": awriting_agent,
+    "refine": arefine_agent,
+    "export": aexport_agent,
+}
 
 # === Compile the flow ===
-research_graph = workflow.compile()
+# research_graph runs with invoke/stream; async_research_graph with ainvoke/astream
+research_graph = build_workflow(SYNC_AGENTS).compile()
+async_research_graph = build_workflow(ASYNC_AGENTS).compile()
+
+# === Durable runs: SQLite checkpoints keyed by thread/run id ===
+CHECKPOINT_DB = setting("RA_CHECKPOINT_DB", ".cache/checkpoints.sqlite")
+
+_checkpointed_graph = None
+_checkpoint_lock = threading.Lock()
+
+class RunCancelled(Exception):
+    """Raised between nodes when a run's ``should_stop`` callback returns true."""
+
+def _connect_checkpoint_db():
+    directory = os.path.dirname(CHECKPOINT_DB)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(CHECKPOINT_DB, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def get_checkpointed_graph():
+    """research_graph compiled with a SqliteSaver; state is saved after every node."""
+    global _checkpointed_graph
+    with _checkpoint_lock:
+        if _checkpointed_graph is None:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+
+            conn = _connect_checkpoint_db()
+            conn.execute("""CREATE TABLE IF NOT EXISTS research_runs (
+                thread_id TEXT PRIMARY KEY,
+                user TEXT,
+                topic TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )""")
+            _checkpointed_graph = build_workflow(SYNC_AGENTS).compile(checkpointer=SqliteSaver(conn))
+    return _checkpointed_graph
+
+def _set_run_status(thread_id, status, error=None):
+    conn = _connect_checkpoint_db()
+    try:
+        conn.execute(
+            "UPDATE research_runs SET status = ?, error = ?, updated = ? WHERE thread_id = ?",
+            (status, error, time.time(), thread_id),
+        )
+    finally:
+        conn.close()
+
+def mark_cancelled(thread_id: str):
+    """Record a run as cancelled when it was stopped from outside, e.g. by killing its worker."""
+    _set_run_status(thread_id, "cancelled")
+
+def _run_checkpointed(thread_id, graph_input, config=None, should_stop=None, on_event=None):
+    graph = get_checkpointed_graph()
+    run_config = {**(config or {})}
+    run_config["configurable"] = {**run_config.get("configurable", {}), "thread_id": thread_id}
+    _set_run_status(thread_id, "running")
+    try:
+        final_state = None
+        for mode, chunk in graph.stream(graph_input, run_config, stream_mode=["values", "updates", "custom"]):
+            if mode == "values":
+                final_state = chunk
+                # Checked after each step; everything finished so far is checkpointed
+                if should_stop is not None and should_stop():
+                    raise RunCancelled(thread_id)
+            elif on_event is None:
+                continue
+            elif mode == "updates":
+                for node, output in chunk.items():
+                    on_event({"node": node, "event": "output", "output": output})
+            else:
+                on_event(chunk)
+    except RunCancelled:
+        _set_run_status(thread_id, "cancelled")
+        raise
+    except BaseException as e:
+        _set_run_status(thread_id, "failed", f"{type(e).__name__}: {e}")
+        raise
+    _set_run_status(thread_id, "completed")
+    return final_state
+
+def start_run(topic: str, user: str = None, config=None, thread_id: str = None, overrides: dict = None,
+              should_stop=None, on_event=None):
+    """Run the pipeline for ``topic`` under a new run id; returns (thread_id, final_state).
+
+    ``overrides`` seeds extra state, e.g. ``{"structure": edited,
+    "pinned": ["structure"]}`` to redo only what depends on an edited
+    outline. If the run fails part-way, resume_run(thread_id) continues
+    from the last node that completed instead of starting over.
+    ``should_stop`` is polled between nodes; when it returns true the run
+    stops with RunCancelled and can be resumed later. ``on_event`` receives
+    progress as it happens: ``{"node", "event": "start"}``, ``{"node",
+    "event": "end", "status", "outcome", "duration_s"}``, ``{"node",
+    "event": "output", "output"}`` with the fields a node produced, and
+    ``{"node", "section", "text"}`` for each section drafted or refined.
+    """
+    get_checkpointed_graph()
+    thread_id = thread_id or uuid.uuid4().hex
+    now = time.time()
+    conn = _connect_checkpoint_db()
+    try:
+        # A job retried after its worker died starts again under the same id
+        conn.execute(
+            "INSERT OR IGNORE INTO research_runs (thread_id, user, topic, status, created, updated) VALUES (?, ?, ?, 'running', ?, ?)",
+            (thread_id, user, topic, now, now),
+        )
+    finally:
+        conn.close()
+    return thread_id, _run_checkpointed(thread_id, ResearchState(topic=topic, **(overrides or {})), config, should_stop, on_event)
+
+def resume_run(thread_id: str, config=None, should_stop=None, on_event=None):
+    """Continue an interrupted or failed run from its last checkpoint."""
+    graph = get_checkpointed_graph()
+    snapshot = graph.get_state({"configurable": {"thread_id": thread_id}})
+    if not snapshot.next:
+        # Nothing left to run; the saved state is the final one
+        return snapshot.values
+    return _run_checkpointed(thread_id, None, config, should_stop, on_event)
+
+def get_run_state(thread_id: str):
+    """(values, pending node names) of the latest checkpoint for a run."""
+    snapshot = get_checkpointed_graph().get_state({"configurable": {"thread_id": thread_id}})
+    return snapshot.values, list(snapshot.next)
+
+def list_runs(user: str = None, limit: int = 20) -> list:
+    get_checkpointed_graph()
+    conn = _connect_checkpoint_db()
+    try:
+        rows = conn.execute(
+            """SELECT thread_id, topic, status, error, created, updated FROM research_runs
+               WHERE ? IS NULL OR user = ? ORDER BY updated DESC LIMIT ?""",
+            (user, user, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    keys = ["thread_id", "topic", "status", "error", "created", "updated"]
+    return [dict(zip(keys, row)) for row in rows]
+
+async def _amain(topic: str):
+    try:
+        with telemetry.context(run=uuid.uuid4().hex):
+            return await async_research_graph.ainvoke(ResearchState(topic=topic))
+    finally:
+        await aclose_async_clients()
 
 if __name__ == "__main__":
-    initial_state = ResearchState(topic="Social Media and Consumer Trust")
-    final_state = research_graph.invoke(initial_state)
+    final_state = asyncio.run(_amain("Social Media and Consumer Trust"))
     print("\n=== Final Output ===")
     print(final_state["final"])
+    print(f"\nReused without recomputing: {', '.join(skipped_nodes(final_state)) or 'none'}")
@@ -1,4 +1,4 @@
-from utils.model_utils import call_llm
+from utils.streamlit_llm import stream_llm
 import streamlit as st
 
 
@@ -25,9 +25,10 @@ if "research_idea" not in st.session_state:
     st.session_state.research_idea = {}
 
 # Generate ideas
-if st.button("💡 Brainstorm Ideas"):
-    with st.spinner("Thinking..."):
-        prompt = f"""You are an academic research assistant helping define a research project for a Journal of Business Research paper.
+brainstorm = st.button("💡 Brainstorm Ideas")
+regenerate = st.button("🔄 Regenerate")
+if brainstorm or regenerate:
+    prompt = f"""You are an academic research assistant helping define a research project for a Journal of Business Research paper.
 
 Based on the topic: "{topic}", generate the following:
 - 2–3 possible research questions
@@ -38,14 +39,14 @@ Based on the topic: "{topic}", generate the following:
 
 Use clear, formal language.
 """
-        try:
-            response = call_llm(prompt).strip()
-            st.session_state.research_idea["topic"] = topic
-            st.session_state.research_idea["output"] = response
-            st.markdown("### 🧩 Generated Research Directions:")
-            st.text_area("Edit below if needed:", value=response, height=400, key="idea_text")
-        except Exception as e:
-            st.error(f"Error: {e}")
+    try:
+        st.markdown("### 🧩 Generated Research Directions:")
+        response = st.write_stream(stream_llm(prompt, refresh=regenerate)).strip()
+        st.session_state.research_idea["topic"] = topic
+        st.session_state.research_idea["output"] = response
+        st.text_area("Edit below if needed:", value=response, height=400, key="idea_text")
+    except Exception as e:
+        st.error(f"Error: {e}")
 
 # Save to session
 if st.session_state.get("research_idea"):
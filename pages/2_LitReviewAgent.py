@@ -1,15 +1,14 @@
 import streamlit as st
-from utils.model_utils import call_llm
-import fitz
+from utils.streamlit_llm import stream_llm
+from utils.pdf_utils import extract_many, content_hash, PDFError
+from utils.llm_cache import ResponseCache
+from utils.llm_config import setting
+from utils.summarize import condense
+from utils.rag_index import sync_documents, search, has_index
 import os
-import tempfile
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from llama_index.core import (
-    Settings, VectorStoreIndex, SimpleDirectoryReader,
-    StorageContext, load_index_from_storage
-)
-from llama_index.llms.huggingface import HuggingFaceLLM
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+# Heavy libraries (PyMuPDF, llama_index, HuggingFace, NumPy) are imported
+# inside utils.pdf_utils / utils.rag_index only when a PDF is processed,
+# so Streamlit reruns of this page stay cheap.
 
 st.title("📚 Literature Review Agent (Detailed Summary Mode)")
 
@@ -33,24 +32,23 @@ os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(INDEX_DIR, exist_ok=True)
 
 uploaded_files = st.file_uploader("📤 Upload PDF documents", type="pdf", accept_multiple_files=True)
+file_digests = {file.name: content_hash(file.getvalue()) for file in uploaded_files or []}
 
-def extract_text_from_pdf(upload):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(upload.read())
-        tmp_path = tmp.name
-    text = ""
-    with fitz.open(tmp_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+# Bump when the summary prompt changes so stored summaries are regenerated
+SUMMARY_PROMPT_VERSION = "v2"
 
-# === Detailed summary with structured academic prompt ===
-if uploaded_files:
-    for file in uploaded_files:
-        text = extract_text_from_pdf(file)
-        cleaned_text = text[:8000].replace("\n", " ").replace("\r", " ").strip()
+@st.cache_resource
+def get_summary_store():
+    # Shared by every session in this process and across server restarts
+    return ResponseCache(setting("SUMMARY_CACHE_PATH", ".cache/summaries.sqlite"), ttl=0)
 
-        detailed_prompt = f"""You are an academic research assistant. Carefully read the following excerpt from a research paper.
+# === Detailed summary with structured academic prompt ===
+def build_summary_prompt(content, is_notes):
+    # content is either the whole paper or notes condensed from all of it
+    cleaned_text = content.replace("\r", " ").strip() if is_notes else content.replace("\n", " ").replace("\r", " ").strip()
+    source = "section-by-section notes covering the whole of a research paper" if is_notes else "following text of a research paper"
+    label = "Paper Notes" if is_notes else "Paper Text"
+    return f"""You are an academic research assistant. Carefully read the {source}.
 Write a detailed, structured summary that would help a researcher understand the paper’s contributions without reading the full text.
 
 Your summary must include:
@@ -64,16 +62,64 @@ Your summary must include:
 Use a formal and concise academic tone suitable for a literature review section.
 Avoid generalities—focus on what was *actually* found and why it matters.
 
-Paper Text:
+{label}:
 {cleaned_text}
 """
 
-        response = call_llm(detailed_prompt)
-        st.text_area(f"🧾 Detailed Summary of {file.name}", value=response.strip(), height=400)
+if uploaded_files:
+    # Summaries are memoized by file content + prompt version, so reruns
+    # (editing a text area, clicking Save) don't call the LLM again.
+    if "doc_summaries" not in st.session_state:
+        st.session_state.doc_summaries = {}
+    summaries = st.session_state.doc_summaries
+    summary_store = get_summary_store()
+    summary_keys = {
+        file.name: f"{file_digests[file.name]}:{SUMMARY_PROMPT_VERSION}"
+        for file in uploaded_files
+    }
+
+    for file in uploaded_files:
+        key = summary_keys[file.name]
+        if key not in summaries:
+            stored = summary_store.get(key)
+            if stored is not None:
+                summaries[key] = stored
+
+    new_files = [file for file in uploaded_files if summary_keys[file.name] not in summaries]
+    if new_files:
+        with st.spinner(f"Extracting text from {len(new_files)} PDF(s)..."):
+            texts = extract_many([file.getvalue() for file in new_files])
+        progress = st.progress(0.0, text=f"Summarizing {len(new_files)} new document(s)...")
+        for n, (file, text) in enumerate(zip(new_files, texts), 1):
+            key = summary_keys[file.name]
+            if isinstance(text, PDFError):
+                st.error(f"Could not read {file.name}: {text}")
+                progress.progress(n / len(new_files), text=f"Summarized {n} of {len(new_files)} new document(s)")
+                continue
+            st.markdown(f"#### 🧾 Summarizing {file.name}")
+            try:
+                # Long papers are condensed chunk by chunk (cached) before the final summary
+                with st.spinner(f"Reading all of {file.name}..."):
+                    content, is_notes = condense(text, store=summary_store)
+                summary = st.write_stream(stream_llm(build_summary_prompt(content, is_notes))).strip()
+                summaries[key] = summary
+                summary_store.set(key, summary)
+            except Exception as e:
+                st.error(f"Could not summarize {file.name}: {e}")
+            progress.progress(n / len(new_files), text=f"Summarized {n} of {len(new_files)} new document(s)")
+        progress.empty()
+
+    for file in uploaded_files:
+        summary = summaries.get(summary_keys[file.name])
+        if summary is None:
+            continue
+
+        st.markdown(f"#### 🧾 Detailed Summary of {file.name}")
+        st.markdown(summary)
 
         editable_summary = st.text_area(
             f"✏️ Edit Summary for {file.name}",
-            value=response.strip(),
+            value=summary,
             height=400,
             key=f"editable_{file.name}"
         )
@@ -83,3 +129,36 @@ Paper Text:
                 st.session_state.drafts = {}
             st.session_state.drafts[f"Literature Review: {file.name}"] = editable_summary.strip()
             st.success(f"Saved summary of '{file.name}' to your draft.")
+
+# === Persistent per-user library index ===
+if uploaded_files:
+    # Only documents this session hasn't synced yet are handed to the index,
+    # which in turn embeds only the ones that are new or changed on disk.
+    if "indexed_docs" not in st.session_state:
+        st.session_state.indexed_docs = set()
+    unsynced = [file for file in uploaded_files if (file.name, file_digests[file.name]) not in st.session_state.indexed_docs]
+    if unsynced:
+        with st.spinner(f"Indexing {len(unsynced)} document(s) into your library..."):
+            texts = extract_many([file.getvalue() for file in unsynced])
+            readable = [(file, text) for file, text in zip(unsynced, texts) if not isinstance(text, PDFError)]
+            for file, _ in readable:
+                with open(os.path.join(DATA_DIR, file.name), "wb") as f:
+                    f.write(file.getvalue())
+            changed = sync_documents(INDEX_DIR, [
+                (file.name, text, {"file_name": file.name, "sha256": file_digests[file.name]})
+                for file, text in readable
+            ])
+        for file, text in zip(unsynced, texts):
+            if isinstance(text, PDFError):
+                st.warning(f"⚠️ Skipped {file.name} when indexing: {text}")
+        st.session_state.indexed_docs.update((file.name, file_digests[file.name]) for file, _ in readable)
+        if changed:
+            st.caption(f"📚 Added {len(changed)} document(s) to your library index.")
+
+if has_index(INDEX_DIR):
+    st.markdown("### 🔎 Search Your Library")
+    query = st.text_input("Find passages across your uploaded papers:")
+    if query:
+        for score, metadata, text in search(INDEX_DIR, query):
+            with st.expander(f"📄 {metadata.get('file_name', 'Unknown')} (score {score:.3f})"):
+                st.write(text)
@@ -1,4 +1,4 @@
-from utils.model_utils import call_llm
+from utils.streamlit_llm import stream_llm
 import streamlit as st
 
 
@@ -26,9 +26,10 @@ st.markdown("### 📝 Current Research Idea")
 st.text_area("Research Idea:", value=st.session_state.research_idea["output"], height=150, disabled=True)
 
 # Generate structure
-if st.button("📑 Generate Structure"):
-    with st.spinner("Organizing the paper structure..."):
-        prompt = f"""You are an academic research assistant tasked with structuring a research paper.
+generate = st.button("📑 Generate Structure")
+regenerate = st.button("🔄 Regenerate")
+if generate or regenerate:
+    prompt = f"""You are an academic research assistant tasked with structuring a research paper.
 
 Based on the following research idea:
 
@@ -46,13 +47,13 @@ For each section, provide key points or subheadings that should be addressed.
 
 Use clear, formal language.
 """
-        try:
-            response = call_llm(prompt).strip()
-            st.session_state.structure_plan = response
-            st.markdown("### 🏗️ Generated Paper Structure")
-            st.text_area("Edit below if needed:", value=response, height=400, key="structure_text")
-        except Exception as e:
-            st.error(f"Error: {e}")
+    try:
+        st.markdown("### 🏗️ Generated Paper Structure")
+        response = st.write_stream(stream_llm(prompt, refresh=regenerate)).strip()
+        st.session_state.structure_plan = response
+        st.text_area("Edit below if needed:", value=response, height=400, key="structure_text")
+    except Exception as e:
+        st.error(f"Error: {e}")
 
 # Save to session
 if st.session_state.get("structure_plan"):
@@ -1,4 +1,4 @@
-from utils.model_utils import call_llm
+from utils.streamlit_llm import call_llm, stream_llm
 import streamlit as st
 
 
@@ -34,8 +34,7 @@ sections = ["Introduction", "Literature Review", "Methodology", "Results", "Disc
 
 for section in sections:
     if st.button(f"📝 Draft {section}"):
-        with st.spinner(f"Writing the {section} section..."):
-            prompt = f"""You are an academic research assistant tasked with drafting the '{section}' section of a research paper.
+        prompt = f"""You are an academic research assistant tasked with drafting the '{section}' section of a research paper.
 
 Based on the following structure plan:
 
@@ -45,13 +44,13 @@ Draft the '{section}' section with appropriate content and depth.
 
 Use formal academic language.
 """
-            try:
-                response = call_llm(prompt).strip()
-                st.session_state.drafts[section] = response
-                st.markdown(f"### ✍️ Drafted {section} Section")
-                st.text_area(f"{section} Section:", value=response, height=400, key=f"{section}_text")
-            except Exception as e:
-                st.error(f"Error: {e}")
+        try:
+            st.markdown(f"### ✍️ Drafted {section} Section")
+            response = st.write_stream(stream_llm(prompt)).strip()
+            st.session_state.drafts[section] = response
+            st.text_area(f"{section} Section:", value=response, height=400, key=f"{section}_text")
+        except Exception as e:
+            st.error(f"Error: {e}")
 
 # Save drafts to session
 if st.session_state.get("drafts"):
@@ -60,23 +59,11 @@ if st.session_state.get("drafts"):
 
 
 
-import docx
-from docx.shared import Inches
 import base64
-
-def save_docx(content, filename):
-    doc = docx.Document()
-    for section, text in content.items():
-        doc.add_heading(section, level=1)
-        doc.add_paragraph(text)
-        if section in st.session_state.annotations:
-            doc.add_paragraph("📝 Notes: " + st.session_state.annotations[section], style="Intense Quote")
-    path = f"/tmp/{filename}.docx"
-    doc.save(path)
-    return path
+from utils.docx_export import save_docx
 
 if st.button("📤 Export Draft to DOCX"):
-    path = save_docx(st.session_state.drafts, "research_draft")
+    path = save_docx(st.session_state.drafts, "research_draft", st.session_state.get("annotations"))
     with open(path, "rb") as f:
         b64 = base64.b64encode(f.read()).decode()
         href = f'<a href="data:application/vnd.openxmlformats-officedocument.wordprocessingml.document;base64,{b64}" download="research_draft.docx">📥 Download your DOCX</a>'
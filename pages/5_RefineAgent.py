@@ -1,4 +1,4 @@
-from utils.model_utils import call_llm
+from utils.streamlit_llm import call_llm, stream_llm
 import streamlit as st
 
 
@@ -32,8 +32,7 @@ section_to_refine = st.selectbox("Select a section to refine:", list(st.session_
 
 # Refine the selected section
 if st.button(f"🔧 Refine {section_to_refine} Section"):
-    with st.spinner(f"Refining the {section_to_refine} section..."):
-        prompt = f"""You are an academic research assistant tasked with refining the '{section_to_refine}' section of a research paper.
+    prompt = f"""You are an academic research assistant tasked with refining the '{section_to_refine}' section of a research paper.
 
 Current draft of the '{section_to_refine}' section:
 
@@ -43,13 +42,13 @@ Please improve the clarity, coherence, and academic rigor of this section. Ensur
 
 Provide the refined version below:
 """
-        try:
-            response = call_llm(prompt).strip()
-            st.session_state.drafts[section_to_refine] = response
-            st.markdown(f"### ✨ Refined {section_to_refine} Section")
-            st.text_area(f"{section_to_refine} Section:", value=response, height=400, key=f"{section_to_refine}_refined")
-        except Exception as e:
-            st.error(f"Error: {e}")
+    try:
+        st.markdown(f"### ✨ Refined {section_to_refine} Section")
+        response = st.write_stream(stream_llm(prompt)).strip()
+        st.session_state.drafts[section_to_refine] = response
+        st.text_area(f"{section_to_refine} Section:", value=response, height=400, key=f"{section_to_refine}_refined")
+    except Exception as e:
+        st.error(f"Error: {e}")
 
 # Save refined drafts to session
 if st.session_state.get("drafts"):
@@ -58,23 +57,11 @@ if st.session_state.get("drafts"):
 
 
 
-import docx
-from docx.shared import Inches
 import base64
-
-def save_docx(content, filename):
-    doc = docx.Document()
-    for section, text in content.items():
-        doc.add_heading(section, level=1)
-        doc.add_paragraph(text)
-        if section in st.session_state.annotations:
-            doc.add_paragraph("📝 Notes: " + st.session_state.annotations[section], style="Intense Quote")
-    path = f"/tmp/{filename}.docx"
-    doc.save(path)
-    return path
+from utils.docx_export import save_docx
 
 if st.button("📤 Export Draft to DOCX"):
-    path = save_docx(st.session_state.drafts, "research_draft")
+    path = save_docx(st.session_state.drafts, "research_draft", st.session_state.get("annotations"))
     with open(path, "rb") as f:
         b64 = base64.b64encode(f.read()).decode()
         href = f'<a href="data:application/vnd.openxmlformats-officedocument.wordprocessingml.document;base64,{b64}" download="research_draft.docx">📥 Download your DOCX</a>'
@@ -0,0 +1,110 @@
+import streamlit as st
+import pandas as pd
+from utils import telemetry
+from utils.streamlit_llm import get_rate_limit_stats, get_coalesce_stats, get_hedge_stats
+
+
+# === Display user email and logout/reset ===
+if "user_email" not in st.session_state or not st.session_state.user_email:
+    st.warning("Please return to the homepage and enter your email to start.")
+    st.stop()
+
+with st.sidebar:
+    st.markdown(f"👤 **Logged in as:** `{st.session_state.user_email}`")
+    if st.button("🔁 Log out / Reset"):
+        for key in list(st.session_state.keys()):
+            del st.session_state[key]
+        st.experimental_rerun()
+st.title("📈 Metrics")
+st.markdown("Where time goes: latency of every LLM request and pipeline step, per provider and per node.")
+
+limit = st.slider("Spans to load (most recent):", 500, telemetry.MAX_SPANS, min(2000, telemetry.MAX_SPANS), step=500)
+spans = telemetry.recent_spans(limit)
+if not spans:
+    st.info("No metrics recorded yet. Run an agent or the LangGraph pipeline first.")
+    st.stop()
+
+df = pd.DataFrame(spans)
+for column in ["run", "node", "provider", "model", "cache_hit", "attempt", "prompt_tokens", "completion_tokens", "outcome", "queue_wait_s"]:
+    if column not in df:
+        df[column] = None
+# Older spans lack some fields; keep numeric columns numeric for aggregation
+for column in ["attempt", "prompt_tokens", "completion_tokens", "queue_wait_s"]:
+    df[column] = pd.to_numeric(df[column], errors="coerce")
+
+def summarize(frame, by):
+    grouped = frame.groupby(by, dropna=False)["duration_s"]
+    return pd.DataFrame({
+        "count": grouped.count(),
+        "p50_s": grouped.quantile(0.5),
+        "p95_s": grouped.quantile(0.95),
+        "max_s": grouped.max(),
+        "total_s": grouped.sum(),
+    }).round(3).sort_values("p95_s", ascending=False)
+
+def latency_histogram(durations):
+    bounds = [0] + list(telemetry.BUCKETS) + [float("inf")]
+    labels = [f"≤{b}s" for b in telemetry.BUCKETS] + [f">{telemetry.BUCKETS[-1]}s"]
+    counts = pd.cut(durations, bounds, labels=labels).value_counts().reindex(labels)
+    st.bar_chart(counts)
+
+# === LLM requests ===
+llm = df[df["kind"] == "llm"]
+sent = llm[llm["cache_hit"] != True]  # noqa: E712 (column holds True/None)
+st.markdown("### 🤖 LLM Requests")
+col1, col2, col3, col4, col5, col6 = st.columns(6)
+col1.metric("Requests", len(sent))
+col2.metric("Cache hits", int((llm["cache_hit"] == True).sum()))  # noqa: E712
+col3.metric("Errors", int((sent["status"] == "error").sum()))
+col4.metric("Retries", int((sent["attempt"].fillna(0) > 0).sum()))
+# Counted by this server process since it started
+col5.metric("Deduplicated", get_coalesce_stats()["coalesced"], help="Calls that joined an identical request already in flight")
+hedges = get_hedge_stats()
+col6.metric("Hedges won", f"{hedges['hedges_won']} / {hedges['hedges_fired']}",
+            help=f"Backup requests that answered first / backups sent, over {hedges['calls']} hedged calls "
+                 f"({hedges['hedges_denied']} denied by the budget)")
+if not sent.empty:
+    latency_histogram(sent["duration_s"])
+    st.markdown("**By provider and model**")
+    by_provider = summarize(sent, ["provider", "model"])
+    by_provider["errors"] = sent[sent["status"] == "error"].groupby(["provider", "model"]).size()
+    by_provider["prompt_tokens"] = sent.groupby(["provider", "model"])["prompt_tokens"].sum()
+    by_provider["completion_tokens"] = sent.groupby(["provider", "model"])["completion_tokens"].sum()
+    by_provider["queue_wait_p95_s"] = sent.groupby(["provider", "model"])["queue_wait_s"].quantile(0.95).round(3)
+    st.dataframe(by_provider.fillna(0))
+
+# === Rate limits (this server process) ===
+limits = [row for row in get_rate_limit_stats() if row["rpm"] or row["tpm"]]
+if limits:
+    st.markdown("### ⏳ Rate Limit Queues")
+    st.caption("Requests waiting for provider capacity right now, and how long past requests waited.")
+    st.dataframe(pd.DataFrame(limits).set_index("provider"))
+
+# === Pipeline nodes ===
+nodes = df[df["kind"] == "node"]
+st.markdown("### 🧩 Pipeline Steps")
+if nodes.empty:
+    st.caption("No pipeline runs recorded yet.")
+else:
+    st.dataframe(summarize(nodes[nodes["outcome"] == "computed"], "name"))
+
+    runs = nodes.dropna(subset=["run"]).groupby("run")["ts"].min().sort_values(ascending=False)
+    if not runs.empty:
+        run = st.selectbox(
+            "Run:",
+            runs.index,
+            format_func=lambda r: f"{pd.to_datetime(runs[r], unit='s'):%Y-%m-%d %H:%M:%S} · {r}",
+        )
+        run_nodes = nodes[nodes["run"] == run].set_index("name")
+        st.bar_chart(run_nodes["duration_s"])
+        run_llm = sent[sent["run"] == run]
+        if not run_llm.empty:
+            st.markdown("**LLM requests in this run, by node**")
+            st.dataframe(summarize(run_llm, "node"))
+        st.dataframe(run_nodes[["outcome", "status", "duration_s"]])
+
+# === Export ===
+st.markdown("---")
+col1, col2 = st.columns(2)
+col1.download_button("⬇️ Spans (JSON lines)", telemetry.to_jsonl(spans), "spans.jsonl", "application/x-ndjson")
+col2.download_button("⬇️ Prometheus metrics", telemetry.to_prometheus(spans), "metrics.prom", "text/plain")
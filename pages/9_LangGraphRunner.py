@@ -1,5 +1,8 @@
+import time
 import streamlit as st
-from langgraph_flow import research_graph, ResearchState
+import utils.streamlit_llm  # noqa: F401 (adds st.secrets as a settings source)
+from langgraph_flow import NODE_INPUTS, SECTIONS, list_runs, get_run_state, skipped_nodes
+from utils import jobs
 
 
 # === Display user email and logout/reset ===
@@ -16,31 +19,200 @@ with st.sidebar:
 st.title("🔁 LangGraph Research Flow Runner")
 st.markdown("This runs the full agent workflow: Idea → LitReview → Structure → Writing → Refine → Export")
 
+@st.cache_resource
+def start_job_workers():
+    # One worker pool per server process; JOB_WORKERS=0 when it runs separately
+    return jobs.WorkerPool().start() if jobs.JOB_WORKERS > 0 else None
+
+start_job_workers()
+
+def show_results(topic, final_state, key="results"):
+    # Save to session state for other agents to access
+    st.session_state.research_idea = {
+        "topic": topic,
+        "output": final_state.get("idea", "")
+    }
+    st.session_state.structure_plan = final_state.get("structure", "")
+    st.session_state.drafts = final_state.get("drafts", {})
+
+    # Display results
+    st.success("✅ Research flow completed!")
+    reused = skipped_nodes(final_state)
+    if reused:
+        st.caption(f"♻️ Reused without recomputing: {', '.join(reused)}")
+    for section, error in final_state.get("refine_errors", {}).items():
+        st.warning(f"⚠️ Could not refine {section}; kept the unrefined draft. ({error})")
+    prompt_sizes = final_state.get("prompt_sizes", [])
+    if prompt_sizes:
+        with st.expander("📏 Prompt sizes per step"):
+            st.caption("Estimated tokens sent to the LLM; the shared prefix is identical across a step's prompts.")
+            st.table(prompt_sizes)
+    st.markdown("### 📄 Final Output")
+    st.text_area("Complete Document: ", value=final_state.get("final", ""), height=300, key=f"{key}_final")
+
+    st.markdown("---")
+    st.markdown("### 📃 Section Drafts")
+    for section, content in final_state.get("drafts", {}).items():
+        st.markdown(f"**{section}**")
+        st.text_area(label="", value=content, height=200, key=f"{key}_{section}")
+
 # Step 1: Topic input
 topic = st.text_input("Enter your research topic:")
+reuse = st.checkbox("♻️ Reuse steps whose inputs haven't changed", value=True)
 run = st.button("🚀 Run Full Pipeline")
 
+def run_pipeline(topic, overrides=None, thread_id=None):
+    # Runs in a background worker; the page only polls for its status
+    payload = {"topic": topic, "overrides": overrides, "force_recompute": not reuse}
+    try:
+        jobs.submit("pipeline", payload, user=st.session_state.user_email, thread_id=thread_id)
+    except (jobs.JobLimitError, jobs.JobActiveError) as e:
+        st.error(str(e))
+    else:
+        st.session_state.loaded_job = None
+        st.session_state.loaded_run = None
+        st.success("Queued. Progress shows under My Jobs; you can leave this page and come back for the results.")
+
 if run and topic:
-    with st.spinner("Running LangGraph agent pipeline..."):
-        # Create initial state
-        initial_state = ResearchState(topic=topic)
-        final_state = research_graph.invoke(initial_state)
-
-        # Save to session state for other agents to access
-        st.session_state.research_idea = {
-            "topic": topic,
-            "output": final_state.get("idea", "")
-        }
-        st.session_state.structure_plan = final_state.get("structure", "")
-        st.session_state.drafts = final_state.get("drafts", {})
-
-        # Display results
-        st.success("✅ Research flow completed!")
-        st.markdown("### 📄 Final Output")
-        st.text_area("Complete Document: ", value=final_state.get("final", ""), height=300)
-
-        st.markdown("---")
-        st.markdown("### 📃 Section Drafts")
-        for section, content in final_state.get("drafts", {}).items():
-            st.markdown(f"**{section}**")
-            st.text_area(label="", value=content, height=200, key=section)
+    run_pipeline(topic)
+
+# Results of a finished job picked up from My Jobs, or of a past run; only one per page run
+loaded_job = jobs.get_job(st.session_state.loaded_job) if st.session_state.get("loaded_job") else None
+if loaded_job and loaded_job["status"] == "completed":
+    show_results(loaded_job["payload"]["topic"], loaded_job["result"], key="job")
+elif st.session_state.get("loaded_run"):
+    run_values, run_pending = get_run_state(st.session_state.loaded_run)
+    if not run_pending:
+        show_results(run_values.get("topic", ""), run_values, key="run")
+
+# Re-run after editing only the outline: idea and literature review are reused
+if topic and st.session_state.get("structure_plan"):
+    with st.expander("✏️ Edit the structure and re-run"):
+        edited_structure = st.text_area("Structure:", value=st.session_state.structure_plan, height=300, key="edited_structure")
+        if st.button("🔁 Re-run From Edited Structure"):
+            run_pipeline(topic, overrides={"structure": edited_structure, "pinned": ["structure"]})
+
+# Step 2: Jobs of this user
+st.markdown("---")
+st.markdown("### ⏳ My Jobs")
+my_jobs = jobs.list_jobs(user=st.session_state.user_email)
+active = any(job["status"] not in jobs.FINISHED for job in my_jobs)
+
+def show_progress(job):
+    # Replay the job's progress events: step timings, then outputs as they arrived
+    steps, outputs, sections = {}, {}, {}
+    for event in jobs.job_events(job["id"]):
+        node = event["node"]
+        if event.get("event") == "start":
+            steps[node] = {"status": "running", "started": event["ts"]}
+        elif event.get("event") == "end":
+            status = event["outcome"] if event["status"] == "ok" else "error"
+            steps[node] = {"status": status, "seconds": event["duration_s"]}
+        elif event.get("event") == "output":
+            outputs.update(event["output"])
+        elif "section" in event:
+            sections[event["section"]] = (node, event["text"])
+    # Sections arrive in whatever order they finish; keep the paper's order
+    sections = {section: sections[section] for section in SECTIONS if section in sections}
+
+    # Keep partial results, so a run that stops part-way still leaves usable drafts
+    topic = job["payload"]["topic"]
+    if outputs.get("idea"):
+        st.session_state.research_idea = {"topic": topic, "output": outputs["idea"]}
+    if outputs.get("structure"):
+        st.session_state.structure_plan = outputs["structure"]
+    if sections:
+        st.session_state.drafts = {section: text for section, (_, text) in sections.items()}
+
+    finished = [node for node, step in steps.items() if step["status"] not in ("running", "error")]
+    running = [node for node, step in steps.items() if step["status"] == "running"]
+    label = f"Step {len(finished)} of {len(NODE_INPUTS)} done"
+    if running:
+        label += f" · running {', '.join(running)}"
+        if running[0] in ("WritingAgent", "RefineAgent"):
+            done = sum(node == running[0] for node, _ in sections.values())
+            label += f" ({done} of {len(SECTIONS)} sections)"
+    st.progress(len(finished) / len(NODE_INPUTS), text=label)
+    rows = []
+    for node in NODE_INPUTS:
+        step = steps.get(node, {"status": "waiting"})
+        seconds = step.get("seconds", time.time() - step["started"] if "started" in step else None)
+        rows.append({"step": node, "status": step["status"], "seconds": None if seconds is None else round(seconds, 1)})
+    st.table(rows)
+    for field, title in [("idea", "💡 Idea"), ("lit_review", "📚 Literature Review"), ("structure", "🧱 Structure")]:
+        if outputs.get(field):
+            with st.expander(title):
+                st.markdown(outputs[field])
+    for section, (node, text) in sections.items():
+        with st.expander(f"📃 {section} ({'refined' if node == 'RefineAgent' else 'draft'})"):
+            st.markdown(text)
+
+@st.fragment(run_every=2 if active else None)
+def show_jobs():
+    current = jobs.list_jobs(user=st.session_state.user_email)
+    if not current:
+        st.caption("No jobs yet.")
+        return
+    for job in current:
+        label = job["payload"].get("topic") or job["payload"].get("agent") or job["kind"]
+        started = job["started"] or job["created"]
+        elapsed = (job["finished"] or time.time()) - started
+        col1, col2, col3 = st.columns([4, 2, 1])
+        col1.markdown(f"**{label}** · {time.strftime('%Y-%m-%d %H:%M', time.localtime(job['created']))}")
+        status = "cancelling" if job["cancel_requested"] and job["status"] == "running" else job["status"]
+        col2.markdown(f"`{status}` · {elapsed:.0f}s" if job["status"] != "queued" else "`queued`")
+        if job["status"] not in jobs.FINISHED:
+            if not job["cancel_requested"] and col3.button("✖️ Cancel", key=f"cancel_{job['id']}"):
+                jobs.cancel(job["id"])
+                st.rerun()
+        elif job["status"] == "completed" and job["kind"] == "pipeline":
+            if col3.button("📂 Open", key=f"open_{job['id']}"):
+                st.session_state.loaded_job = job["id"]
+                st.session_state.loaded_run = None
+                st.rerun()
+        if job["error"]:
+            st.caption(job["error"])
+        if job["status"] == "running" and job["kind"] == "pipeline":
+            show_progress(job)
+    # A job this page is waiting for just finished: redraw the whole page with its results
+    if active and all(job["status"] in jobs.FINISHED for job in current):
+        latest = current[0]
+        if latest["status"] == "completed" and latest["kind"] == "pipeline":
+            st.session_state.loaded_job = latest["id"]
+            st.session_state.loaded_run = None
+        st.rerun()
+
+show_jobs()
+if jobs.JOB_WORKERS <= 0:
+    st.caption("Jobs run in a separate worker pool: `python -m utils.jobs --workers 4`.")
+
+# Step 3: Past runs
+st.markdown("---")
+st.markdown("### 🗂️ Past Runs")
+runs = list_runs(user=st.session_state.user_email)
+if not runs:
+    st.caption("No saved runs yet.")
+else:
+    labels = {
+        run["thread_id"]: f"{run['topic']} · {run['status']} · {time.strftime('%Y-%m-%d %H:%M', time.localtime(run['updated']))}"
+        for run in runs
+    }
+    selected = st.selectbox("Select a run:", list(labels), format_func=labels.get)
+    selected_run = next(run for run in runs if run["thread_id"] == selected)
+    values, pending = get_run_state(selected)
+    if pending:
+        st.info(f"Stopped before: {', '.join(pending)}")
+    if selected_run["error"]:
+        st.caption(f"Last error: {selected_run['error']}")
+
+    running_threads = {job["thread_id"] for job in my_jobs if job["status"] not in jobs.FINISHED}
+    if pending and selected in running_threads:
+        st.caption("⏳ A job for this run is queued or running; see My Jobs above.")
+    elif pending and st.button("▶️ Resume Run"):
+        # Continues from the last completed step in a background worker
+        run_pipeline(selected_run["topic"], thread_id=selected)
+    elif not pending and st.button("📂 Load Results"):
+        # Drawn with the other results above, so a job opened earlier isn't shown twice
+        st.session_state.loaded_job = None
+        st.session_state.loaded_run = selected
+        st.rerun()
@@ -1,5 +1,5 @@
 
-from utils.client import get_inference_client
+from utils.model_utils import get_active_provider
 
-client = get_inference_client()
-print("✅ Client initialized:", client)
+provider = get_active_provider()
+print("✅ Client initialized:", provider["name"], provider["model"])
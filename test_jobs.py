@@ -0,0 +1,34 @@
+import pytest
+
+from utils import jobs
+
+
+@pytest.fixture(autouse=True)
+def jobs_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "JOBS_DB", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(jobs, "JOBS_PER_USER", 1)
+
+
+def test_claim_respects_per_user_limit():
+    first = jobs.submit("llm", {"prompt": "a"}, user="u1")
+    jobs.submit("llm", {"prompt": "b"}, user="u1")
+    other = jobs.submit("llm", {"prompt": "c"}, user="u2")
+    assert jobs.claim_next("w")["id"] == first
+    # u1 already has a job running, so u2's is next
+    assert jobs.claim_next("w")["id"] == other
+    assert jobs.claim_next("w") is None
+
+
+def test_cancel_queued_job():
+    job_id = jobs.submit("llm", {"prompt": "a"}, user="u1")
+    assert jobs.cancel(job_id) == "cancelled"
+    assert jobs.claim_next("w") is None
+
+
+def test_one_unfinished_job_per_pipeline_run():
+    job_id = jobs.submit("pipeline", {"topic": "t"}, user="u1")
+    thread_id = jobs.get_job(job_id)["thread_id"]
+    with pytest.raises(jobs.JobActiveError):
+        jobs.submit("pipeline", {"topic": "t"}, user="u1", thread_id=thread_id)
+    jobs.cancel(job_id)
+    jobs.submit("pipeline", {"topic": "t"}, user="u1", thread_id=thread_id)
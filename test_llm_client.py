@@ -0,0 +1,253 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from utils import llm_config, model_utils, telemetry
+from utils.llm_router import ProviderRouter
+from utils.singleflight import SingleFlight
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+from mock_llm import MockOptions, start_server  # noqa: E402
+
+
+@pytest.fixture
+def mock_provider(monkeypatch):
+    options = MockOptions(latency=0.2, jitter=0, error_rate=0, rate_limit_rate=0, seed=0)
+    server, base_url = start_server(options)
+    monkeypatch.setattr(telemetry, "TELEMETRY_PATH", "")
+    llm_config.set_providers([{
+        "name": "Mock", "base_url": base_url, "headers": lambda token: {"Authorization": f"Bearer {token}"},
+        "token": "mock", "model": "mock-model",
+    }])
+    yield options
+    server.shutdown()
+    llm_config.reload()
+
+
+def test_do_shares_result_between_concurrent_callers():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_do_shares_errors():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+
+
+def test_ado_leader_cancellation_does_not_reach_waiters():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def run():
+        leader = asyncio.create_task(flight.ado("k", slow))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.ado("k", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == "answer"
+    assert flight.stats() == {"executed": 1, "coalesced": 1, "in_flight": 0, "coalesced_ratio": 0.5}
+
+
+def test_ado_cancels_call_once_every_caller_gave_up():
+    flight = SingleFlight()
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        finished.append(1)
+
+    async def run():
+        tasks = [asyncio.create_task(flight.ado("k", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+    assert finished == []
+
+
+PROVIDERS = [{"name": "A", "model": "a"}, {"name": "B", "model": "b"}]
+
+
+def test_router_prefers_faster_provider():
+    router = ProviderRouter(PROVIDERS, prior_latency=1.0)
+    router.record_success(PROVIDERS[0], 3.0)
+    router.record_success(PROVIDERS[1], 0.2)
+    assert router.candidates()[0] is PROVIDERS[1]
+
+
+def test_router_opens_breaker_and_lets_one_trial_through():
+    router = ProviderRouter(PROVIDERS, failure_threshold=2, cooldown=0.1)
+    for _ in range(2):
+        router.record_failure(PROVIDERS[0], 0.1)
+    assert not router.is_closed(PROVIDERS[0])
+    assert router.candidates() == [PROVIDERS[1]]
+    time.sleep(0.15)
+    assert router.begin(PROVIDERS[0])
+    assert not router.begin(PROVIDERS[0])
+    router.record_success(PROVIDERS[0], 0.1)
+    assert router.is_closed(PROVIDERS[0])
+
+
+def test_router_cancel_releases_half_open_trial():
+    router = ProviderRouter(PROVIDERS, cooldown=0.05)
+    router.record_failure(PROVIDERS[0], 0.1, rate_limited=True)
+    time.sleep(0.1)
+    assert router.begin(PROVIDERS[0])
+    router.cancel(PROVIDERS[0])
+    assert router.begin(PROVIDERS[0])
+
+
+def test_call_llm_sends_identical_concurrent_calls_once(mock_provider):
+    results = []
+
+    def call(use_cache):
+        results.append(model_utils.call_llm("same prompt", use_cache=use_cache))
+
+    threads = [threading.Thread(target=call, args=(False,)) for _ in range(4)]
+    # A caller with different cache settings never shares a request
+    threads.append(threading.Thread(target=call, args=(True,)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 5
+    assert mock_provider.counts["requests"] == 2
+
+
+def test_router_retry_after_zero_reopens_at_once():
+    router = ProviderRouter(PROVIDERS, cooldown=30)
+    router.record_failure(PROVIDERS[0], 0.1, rate_limited=True, retry_after=0)
+    assert PROVIDERS[0] in router.candidates()
+    assert router.begin(PROVIDERS[0])
+
+
+def test_cached_answer_found_under_any_model(mock_provider, monkeypatch, tmp_path):
+    from utils.llm_cache import ResponseCache, make_key
+
+    base = llm_config.get_providers()[0]
+    llm_config.set_providers([base, {**base, "model": "mock-model-2"}])
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(model_utils, "_response_cache", cache)
+    # Stored under the model the router doesn't try first
+    cache.set(make_key("mock-model-2", "cached prompt", 0.7), "from cache")
+    assert model_utils.call_llm("cached prompt") == "from cache"
+    assert "".join(model_utils.stream_llm("cached prompt")) == "from cache"
+    assert asyncio.run(model_utils.acall_llm("cached prompt")) == "from cache"
+    assert mock_provider.counts["requests"] == 0
+
+
+def test_cache_counts_one_lookup_per_call(mock_provider, monkeypatch, tmp_path):
+    from utils.llm_cache import ResponseCache
+
+    base = llm_config.get_providers()[0]
+    llm_config.set_providers([base] + [{**base, "model": f"mock-model-{i}"} for i in range(2, 7)])
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(model_utils, "_response_cache", cache)
+    model_utils.call_llm("counted prompt")
+    assert (cache.hits, cache.misses) == (0, 1)
+    model_utils.call_llm("counted prompt")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_abandoned_stream_releases_half_open_trial(mock_provider, monkeypatch):
+    spans = []
+    monkeypatch.setattr(telemetry, "record", lambda kind, name, duration, **attrs: spans.append(attrs))
+    provider = llm_config.get_providers()[0]
+    router = model_utils.get_router()
+    router.record_failure(provider, 0.1, rate_limited=True, retry_after=0)
+    stream = model_utils.stream_llm("abandoned prompt", use_cache=False)
+    next(stream)
+    # A Streamlit rerun drops the generator part-way
+    stream.close()
+    assert spans[-1]["status"] == "cancelled"
+    assert router.begin(provider)
+
+
+def test_hedge_not_counted_when_backup_cannot_start():
+    from utils.hedging import HedgeBudget, hedged
+
+    budget = HedgeBudget(max_ratio=1.0)
+
+    def slow():
+        time.sleep(0.2)
+        return "primary"
+
+    assert hedged(slow, lambda: "backup", 0.05, budget, ready=lambda: False) == ("primary", False)
+    assert budget.stats()["hedges_fired"] == 0
+    assert budget.credits == budget.burst
+
+
+def test_hedge_refunded_when_backup_is_rate_limited(monkeypatch):
+    base = {"name": "Mock", "base_url": "http://127.0.0.1:9", "token": "mock", "model": "m",
+            "headers": lambda token: {}}
+    llm_config.set_providers([{**base, "rpm": 1}, {**base, "name": "Backup", "model": "b", "rpm": 1}])
+    budget = model_utils.HedgeBudget(max_ratio=1.0)
+    monkeypatch.setattr(model_utils, "hedge_budget", budget)
+    monkeypatch.setattr(model_utils, "HEDGE_MIN_DELAY", 0.05)
+    # No latency history yet, so the hedge delay falls back to READ_TIMEOUT
+    monkeypatch.setattr(model_utils, "READ_TIMEOUT", 0.05)
+    monkeypatch.setattr(model_utils, "_attempt", _fake_attempt)
+    primary, backup = llm_config.get_providers()
+    try:
+        # The backup passes the capacity check, then loses it to another caller
+        monkeypatch.setattr(model_utils.RateLimiter, "expected_wait", lambda self, key, tokens=0: 0.0)
+        assert model_utils._hedged_attempt(primary, backup, "p", 0.7) == (primary, "primary")
+    finally:
+        llm_config.reload()
+    assert budget.stats()["hedges_fired"] == 0
+    assert budget.credits == budget.burst
+
+
+def _fake_attempt(provider, prompt, temperature, attempt=0, hedge=False, deadline=None, waited=None):
+    if hedge:
+        raise model_utils.RateLimitTimeout(provider["name"], 1.0)
+    time.sleep(0.2)
+    return "primary"
@@ -0,0 +1,28 @@
+import pytest
+
+from utils import pdf_utils
+
+
+def _sample_pdf(pages: int) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    for p in range(pages):
+        doc.new_page().insert_text((50, 50), f"Page {p + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_extract_many_reports_unreadable_files_per_slot(monkeypatch, tmp_path, workers):
+    monkeypatch.setattr(pdf_utils, "PDF_TEXT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_utils, "PDF_WORKERS", workers)
+    good = _sample_pdf(1)
+    texts = pdf_utils.extract_many([good, b"%PDF-1.4 not really a pdf", _sample_pdf(2)])
+    assert "Page 1" in texts[0]
+    assert isinstance(texts[1], pdf_utils.PDFError)
+    assert "Page 2" in texts[2]
+    # Failures aren't cached, good documents are
+    assert pdf_utils.extract_many([good]) == [texts[0]]
+    assert len(list(tmp_path.rglob("*.txt"))) == 2
@@ -0,0 +1,49 @@
+import pytest
+
+from utils.rate_limit import RateLimiter, RateLimitTimeout
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    path = str(tmp_path / "buckets.sqlite") if request.param == "sqlite" else None
+    return RateLimiter({"a": (6, 0), "b": (0, 0)}, path=path)
+
+
+def test_unlimited_provider_never_waits(limiter):
+    for _ in range(100):
+        assert limiter.acquire("b", timeout=0) == 0.0
+    assert limiter.expected_wait("b") == 0.0
+
+
+def test_requests_queue_in_arrival_order(limiter):
+    # 6 rpm refills one request every 10 seconds; the bucket starts full
+    for _ in range(6):
+        assert limiter.acquire("a", timeout=0) == 0.0
+    waits = [limiter._reserve("a", 0, timeout=60) for _ in range(3)]
+    assert waits == pytest.approx([10.0, 20.0, 30.0], abs=0.5)
+
+
+def test_expected_wait_reserves_nothing(limiter):
+    for _ in range(6):
+        limiter.acquire("a", timeout=0)
+    first = limiter.expected_wait("a")
+    assert limiter.expected_wait("a") == pytest.approx(first, abs=0.5)
+    assert limiter._reserve("a", 0, timeout=60) == pytest.approx(first, abs=0.5)
+
+
+def test_wait_past_timeout_raises_and_reserves_nothing(limiter):
+    for _ in range(6):
+        limiter.acquire("a", timeout=0)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("a", timeout=5)
+    assert limiter.expected_wait("a") == pytest.approx(10.0, abs=0.5)
+    assert limiter.stats()[0]["timeouts"] == 1
+
+
+def test_tokens_per_minute(tmp_path):
+    limiter = RateLimiter({"a": (0, 600)})
+    assert limiter.acquire("a", tokens=600, timeout=0) == 0.0
+    # 600 tpm refills 10 tokens a second
+    assert limiter.expected_wait("a", tokens=100) == pytest.approx(10.0, abs=0.05)
+    limiter.settle("a", estimated=600, actual=300)
+    assert limiter.expected_wait("a", tokens=100) == 0.0
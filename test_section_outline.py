@@ -0,0 +1,26 @@
+from langgraph_flow import section_outline
+
+OUTLINES = {
+    "numbered": "1. Introduction\n- Background\n2. Methodology\n- Sample\n3. Results\n- Findings",
+    "roman": "I. Introduction\n- Background\nII. Methodology\n- Sample\nIII. Results\n- Findings",
+    "markdown": "## Introduction\n- Background\n## Methodology\n- Sample\n## Results\n- Findings",
+    "bold": "**Introduction**\n- Background\n**Methodology:**\n- Sample\n**Results**\n- Findings",
+}
+
+
+def test_section_outline_heading_styles():
+    for style, structure in OUTLINES.items():
+        assert section_outline(structure, "Introduction").splitlines()[1:] == ["- Background"], style
+        assert section_outline(structure, "Methodology").splitlines()[1:] == ["- Sample"], style
+        assert section_outline(structure, "Results").splitlines()[1:] == ["- Findings"], style
+
+
+def test_section_outline_bullets_are_not_headings():
+    structure = "## Methodology\n* Results of the pilot study\n- Discussion with experts\n## Results\n- Findings"
+    assert section_outline(structure, "Methodology") == (
+        "## Methodology\n* Results of the pilot study\n- Discussion with experts"
+    )
+
+
+def test_section_outline_missing_section_returns_everything():
+    assert section_outline(OUTLINES["markdown"], "Conclusion") == OUTLINES["markdown"]
@@ -0,0 +1,52 @@
+import numpy as np
+
+from utils.vector_store import MmapVectorStore
+
+
+def test_compact_drops_replaced_rows_and_keeps_search_results(tmp_path):
+    store = MmapVectorStore(str(tmp_path), dtype="float32")
+    store.replace_document("a", "h1", np.eye(4)[:2], ["a0", "a1"], {"doc": "a"})
+    store.replace_document("b", "h1", np.eye(4)[2:], ["b0", "b1"], {"doc": "b"})
+    store.replace_document("a", "h2", np.eye(4)[[1]], ["a1 new"], {"doc": "a"})
+    assert store.tombstones() == 2
+    before = store.search(np.eye(4)[3], top_k=3)
+
+    store.compact()
+    assert store.tombstones() == 0
+    assert len(store) == 3
+    assert store.search(np.eye(4)[3], top_k=3) == before
+    assert store.search(np.eye(4)[1], top_k=1)[0][2] == "a1 new"
+
+
+def test_compact_sees_rows_appended_by_another_handle(tmp_path):
+    reader = MmapVectorStore(str(tmp_path), dtype="float32")
+    reader.replace_document("a", "h1", np.eye(3)[:1], ["a0"], {})
+    reader.search(np.eye(3)[0])
+    # Another process appends after this handle cached its view
+    writer = MmapVectorStore(str(tmp_path), dtype="float32")
+    writer.replace_document("a", "h2", np.eye(3)[1:2], ["a1"], {})
+    writer.replace_document("b", "h1", np.eye(3)[2:], ["b0"], {})
+    reader.compact()
+    assert sorted(text for _, _, text in reader.search(np.ones(3), top_k=5)) == ["a1", "b0"]
+
+
+def test_search_unaffected_by_compaction_from_another_handle(tmp_path):
+    reader = MmapVectorStore(str(tmp_path), dtype="float32")
+    reader.replace_document("a", "h1", np.eye(4)[:2], ["a0", "a1"], {"doc": "a"})
+    reader.replace_document("b", "h1", np.eye(4)[2:], ["b0", "b1"], {"doc": "b"})
+    reader.replace_document("a", "h2", np.eye(4)[:1], ["a0 new"], {"doc": "a"})
+    writer = MmapVectorStore(str(tmp_path), dtype="float32")
+    take_view = reader._current_view
+
+    def view_then_compact():
+        # Another session compacts after this search scored its rows
+        view = take_view()
+        writer.compact()
+        return view
+
+    query = np.array([0.5, 0.0, 0.2, 1.0])
+    reader._current_view = view_then_compact
+    assert [text for _, _, text in reader.search(query, top_k=2)] == ["b1", "a0 new"]
+    del reader._current_view
+    assert [text for _, _, text in reader.search(query, top_k=2)] == ["b1", "a0 new"]
+    assert writer.tombstones() == 0
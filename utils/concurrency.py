@@ -0,0 +1,84 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.llm_config import setting
+
+# Default cap on concurrent LLM calls made by a single graph node
+DEFAULT_MAX_WORKERS = int(setting("LLM_MAX_WORKERS", "6"))
+
+
+def _with_script_ctx(fn):
+    # Streamlit keeps session state on the script thread; hand its run context
+    # to worker threads so calls made from the pool still see the session.
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return fn
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return fn
+
+    def wrapped(item):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(item)
+
+    return wrapped
+
+
+def _with_context(fn):
+    # Run every item in a copy of the caller's contextvars (e.g. telemetry
+    # tags), which threads in a pool would otherwise not see
+    ctx = contextvars.copy_context()
+
+    def wrapped(item):
+        return ctx.copy().run(fn, item)
+
+    return wrapped
+
+
+def _capture(fn):
+    def wrapped(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return e
+    return wrapped
+
+
+def map_bounded(fn, items, max_workers=None, return_exceptions=False):
+    """Apply ``fn`` to every item on a bounded thread pool.
+
+    Results come back in the same order as ``items``, no matter which call
+    finishes first. By default the first exception raised by ``fn`` is
+    re-raised; with ``return_exceptions=True`` it is returned in that item's
+    slot instead, so one failure doesn't discard the other results.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if return_exceptions:
+        fn = _capture(fn)
+    workers = max(1, min(max_workers or DEFAULT_MAX_WORKERS, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as pool:
+        return list(pool.map(_with_script_ctx(_with_context(fn)), items))
+
+
+async def amap_bounded(fn, items, max_workers=None, return_exceptions=False):
+    """Async counterpart of ``map_bounded`` for coroutine functions.
+
+    At most ``max_workers`` calls are awaited at once; results keep the
+    order of ``items``.
+    """
+    items = list(items)
+    semaphore = asyncio.Semaphore(max(1, max_workers or DEFAULT_MAX_WORKERS))
+
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=return_exceptions)
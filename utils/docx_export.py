@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+
+def build_docx(drafts: dict, annotations: dict = None):
+    """A python-docx Document with one heading and paragraph per section."""
+    import docx
+
+    annotations = annotations or {}
+    doc = docx.Document()
+    for section, text in drafts.items():
+        doc.add_heading(section, level=1)
+        doc.add_paragraph(text)
+        if section in annotations:
+            doc.add_paragraph("📝 Notes: " + annotations[section], style="Intense Quote")
+    return doc
+
+
+def save_docx(drafts: dict, filename: str, annotations: dict = None) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"{filename}.docx")
+    build_docx(drafts, annotations).save(path)
+    return path
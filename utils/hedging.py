@@ -0,0 +1,90 @@
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class HedgeBudget:
+    """Caps hedged requests at a fraction of primary calls.
+
+    Every primary call earns ``max_ratio`` of a credit (up to ``burst``) and
+    each hedge spends one, so over time no more than ``max_ratio`` extra
+    requests are sent per call.
+    """
+
+    def __init__(self, max_ratio: float = 0.1, burst: float = 5.0):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.credits = burst
+        self.calls = 0
+        self.fired = 0
+        self.won = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def on_call(self):
+        with self._lock:
+            self.calls += 1
+            self.credits = min(self.burst, self.credits + self.max_ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.credits < 1.0:
+                self.denied += 1
+                return False
+            self.credits -= 1.0
+            self.fired += 1
+            return True
+
+    def refund(self):
+        # The hedge was never sent after all
+        with self._lock:
+            self.credits = min(self.burst, self.credits + 1.0)
+            self.fired -= 1
+
+    def on_win(self):
+        with self._lock:
+            self.won += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges_fired": self.fired,
+                "hedges_won": self.won,
+                "hedges_denied": self.denied,
+                "fire_rate": round(self.fired / self.calls, 4) if self.calls else 0.0,
+            }
+
+
+_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def hedged(primary, backup, delay: float, budget: HedgeBudget, ready=None):
+    """Run ``primary()``; if it hasn't finished after ``delay`` seconds, also run ``backup()``.
+
+    ``ready()``, if given, is checked before spending budget on the backup;
+    when it returns False the primary is simply awaited.
+
+    Returns ``(result, used_backup)`` for whichever finishes successfully
+    first. The slower attempt is abandoned: its thread runs to completion in
+    the background but its answer is discarded. If both fail, the primary's
+    error is raised.
+    """
+    budget.on_call()
+    first = _pool.submit(contextvars.copy_context().run, primary)
+    done, _ = wait([first], timeout=delay)
+    if done or backup is None or (ready is not None and not ready()) or not budget.try_spend():
+        return first.result(), False
+
+    second = _pool.submit(contextvars.copy_context().run, backup)
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                if future is second:
+                    budget.on_win()
+                return future.result(), future is second
+    return first.result(), False
@@ -0,0 +1,428 @@
+"""Background jobs: a SQLite queue and a pool of worker processes.
+
+Pages submit work with ``submit`` and get a job id back straight away;
+workers claim queued jobs, run them and store the result, which the page
+picks up later with ``get_job``. Job kinds:
+
+- ``pipeline``: the full research pipeline, checkpointed under the job's
+  ``thread_id``; submitting with the thread id of an earlier run resumes it
+- ``agent``: one pipeline step (``idea``, ``lit_review``, ``structure``,
+  ``writing``, ``refine`` or ``export``) on the state given in the payload
+- ``llm``: a single prompt
+
+Each user may have JOBS_PER_USER jobs running and JOBS_MAX_QUEUED waiting.
+Running jobs record progress events (``job_events``) that a page can poll.
+``cancel`` drops a queued job at once; a running pipeline stops after its
+current step, and any job still running JOBS_CANCEL_GRACE seconds after
+the request has its worker process killed (the pool starts a new one).
+
+The Streamlit app starts JOB_WORKERS workers itself. Set JOB_WORKERS=0
+and run the pool separately to keep it alive across app restarts:
+
+    python -m utils.jobs --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from utils import telemetry
+from utils.llm_config import setting
+
+JOBS_DB = setting("RA_JOBS_DB", ".cache/jobs.sqlite")
+JOB_WORKERS = int(setting("JOB_WORKERS", "2"))
+JOBS_PER_USER = int(setting("JOBS_PER_USER", "1"))
+JOBS_MAX_QUEUED = int(setting("JOBS_MAX_QUEUED", "10"))
+JOBS_CANCEL_GRACE = float(setting("JOBS_CANCEL_GRACE", "30"))
+# A running job whose worker hasn't checked in for this long is requeued,
+# up to MAX_ATTEMPTS claims in total
+JOBS_STALE_AFTER = float(setting("JOBS_STALE_AFTER", "60"))
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+
+FINISHED = ("completed", "failed", "cancelled")
+
+_FIELDS = ["id", "user", "kind", "payload", "status", "result", "error", "thread_id", "worker",
+           "attempts", "cancel_requested", "created", "started", "finished", "heartbeat"]
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+class JobLimitError(Exception):
+    """The user already has JOBS_MAX_QUEUED jobs waiting."""
+
+
+class JobActiveError(Exception):
+    """A job for the same pipeline run is already queued or running."""
+
+
+class JobCancelled(Exception):
+    """A job stopped because cancellation was requested."""
+
+
+def _connect():
+    directory = os.path.dirname(JOBS_DB)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    with _schema_lock:
+        if JOBS_DB not in _schema_ready:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user TEXT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                thread_id TEXT,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                heartbeat REAL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, created)")
+            # Progress reported by a running job, in order
+            conn.execute("""CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                event TEXT NOT NULL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq)")
+            _schema_ready.add(JOBS_DB)
+    return conn
+
+
+@contextmanager
+def _transaction():
+    # BEGIN IMMEDIATE serializes read-modify-write across worker processes
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def _row_to_job(row) -> dict:
+    job = dict(zip(_FIELDS, row))
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def submit(kind: str, payload: dict, user: str = None, thread_id: str = None) -> str:
+    """Queue a job and return its id.
+
+    Raises JobLimitError if ``user`` has too many waiting, and
+    JobActiveError if an unfinished job already runs ``thread_id``: two
+    workers on one checkpoint thread would duplicate work and overwrite
+    each other's checkpoints.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = uuid.uuid4().hex
+    if kind == "pipeline":
+        thread_id = thread_id or job_id
+    with _transaction() as conn:
+        (queued,) = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND COALESCE(user, '') = COALESCE(?, '')", (user,)
+        ).fetchone()
+        if queued >= JOBS_MAX_QUEUED:
+            raise JobLimitError(f"{queued} jobs already waiting; cancel one or wait for them to start")
+        if thread_id is not None and conn.execute(
+            "SELECT 1 FROM jobs WHERE thread_id = ? AND status IN ('queued', 'running')", (thread_id,)
+        ).fetchone():
+            raise JobActiveError("This run already has a job queued or running")
+        conn.execute(
+            "INSERT INTO jobs (id, user, kind, payload, status, thread_id, created) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, user, kind, json.dumps(payload), thread_id, time.time()),
+        )
+    return job_id
+
+
+def get_job(job_id: str):
+    conn = _connect()
+    try:
+        row = conn.execute(f"SELECT {', '.join(_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(user: str = None, limit: int = 20) -> list:
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            f"SELECT {', '.join(_FIELDS)} FROM jobs WHERE ? IS NULL OR user = ? ORDER BY created DESC LIMIT ?",
+            (user, user, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [_row_to_job(row) for row in rows]
+
+
+def cancel(job_id: str) -> str:
+    """Cancel a job; returns its status afterwards (``running`` until the worker stops it)."""
+    now = time.time()
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (now, job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row[0] if row else None
+
+
+def claim_next(worker: str):
+    """Mark the oldest queued job whose user is under JOBS_PER_USER running as ours, or return None."""
+    now = time.time()
+    with _transaction() as conn:
+        row = conn.execute(
+            f"""SELECT {', '.join(_FIELDS)} FROM jobs AS j WHERE status = 'queued'
+                AND (SELECT COUNT(*) FROM jobs WHERE status = 'running'
+                     AND COALESCE(user, '') = COALESCE(j.user, '')) < ?
+                ORDER BY created LIMIT 1""",
+            (JOBS_PER_USER,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = _row_to_job(row)
+        conn.execute(
+            """UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+               started = ?, heartbeat = ? WHERE id = ?""",
+            (worker, now, now, job["id"]),
+        )
+    job.update(status="running", worker=worker, attempts=job["attempts"] + 1, started=now)
+    return job
+
+
+def add_event(job_id: str, event: dict):
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO job_events (job_id, ts, event) VALUES (?, ?, ?)",
+            (job_id, time.time(), json.dumps(event, default=str)),
+        )
+    finally:
+        conn.close()
+
+
+def job_events(job_id: str, after: int = 0) -> list:
+    """Progress events of a job with ``seq`` greater than ``after``, each with its ``seq`` and ``ts``."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT seq, ts, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{**json.loads(event), "seq": seq, "ts": ts} for seq, ts, event in rows]
+
+
+def _heartbeat(job_id: str) -> bool:
+    # Returns whether cancellation was requested
+    conn = _connect()
+    try:
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return bool(row and row[0])
+
+
+def _finish(job_id: str, status: str, result=None, error: str = None):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ? AND status = 'running'",
+            (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id),
+        )
+    finally:
+        conn.close()
+
+
+def requeue_stale() -> int:
+    """Put running jobs whose worker stopped checking in back on the queue; returns how many."""
+    now = time.time()
+    cutoff = now - JOBS_STALE_AFTER
+    with _transaction() as conn:
+        conn.execute(
+            """UPDATE jobs SET status = 'cancelled', finished = ?
+               WHERE status = 'running' AND heartbeat < ? AND cancel_requested""",
+            (now, cutoff),
+        )
+        conn.execute(
+            """UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', finished = ?
+               WHERE status = 'running' AND heartbeat < ? AND attempts >= ?""",
+            (now, cutoff, MAX_ATTEMPTS),
+        )
+        return conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+            (cutoff,),
+        ).rowcount
+
+
+# === Job kinds ===
+# Each handler takes the job, a should_stop() callback and a report(event) callback
+def _run_pipeline(job: dict, should_stop, report):
+    from langgraph_flow import get_run_state, resume_run, start_run
+
+    payload = job["payload"]
+    config = {"configurable": {"force_recompute": bool(payload.get("force_recompute"))}}
+    values, _ = get_run_state(job["thread_id"])
+    if values:
+        # An earlier run, or an earlier attempt of this job, got part-way
+        return resume_run(job["thread_id"], config, should_stop=should_stop, on_event=report)
+    _, final_state = start_run(payload["topic"], user=job["user"], config=config, thread_id=job["thread_id"],
+                               overrides=payload.get("overrides"), should_stop=should_stop, on_event=report)
+    return final_state
+
+
+def _run_agent(job: dict, should_stop, report):
+    from langgraph_flow import ResearchState, SYNC_AGENTS
+
+    payload = job["payload"]
+    return SYNC_AGENTS[payload["agent"]](ResearchState(**payload.get("state", {})))
+
+
+def _run_llm(job: dict, should_stop, report):
+    from utils.model_utils import call_llm
+
+    payload = job["payload"]
+    return {"output": call_llm(payload["prompt"], temperature=payload.get("temperature", 0.7))}
+
+
+HANDLERS = {
+    "pipeline": _run_pipeline,
+    "agent": _run_agent,
+    "llm": _run_llm,
+}
+
+
+# === Workers ===
+def run_job(job: dict):
+    """Run a claimed job to the end, recording its heartbeat, result and status."""
+    from langgraph_flow import RunCancelled, mark_cancelled
+
+    stop = threading.Event()
+    outcome = {}
+
+    def target():
+        try:
+            with telemetry.context(run=job["thread_id"] or f"job:{job['id']}"):
+                outcome["result"] = HANDLERS[job["kind"]](job, stop.is_set, lambda event: add_event(job["id"], event))
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name=f"job-{job['id']}", daemon=True)
+    thread.start()
+    cancel_requested_at = None
+    while thread.is_alive():
+        thread.join(POLL_INTERVAL)
+        if _heartbeat(job["id"]) and cancel_requested_at is None:
+            stop.set()
+            cancel_requested_at = time.time()
+        if cancel_requested_at is not None and thread.is_alive() \
+                and time.time() - cancel_requested_at > JOBS_CANCEL_GRACE:
+            _finish(job["id"], "cancelled", error="Stopped by cancelling its worker")
+            if job["kind"] == "pipeline":
+                mark_cancelled(job["thread_id"])
+            # A thread can't be interrupted mid-request; the pool replaces this process
+            os._exit(1)
+
+    error = outcome.get("error")
+    if error is None:
+        _finish(job["id"], "completed", outcome.get("result"))
+    elif isinstance(error, (RunCancelled, JobCancelled)) or stop.is_set():
+        _finish(job["id"], "cancelled")
+    else:
+        _finish(job["id"], "failed", error=f"{type(error).__name__}: {error}")
+
+
+def _worker_main():
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        job = claim_next(worker)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(job)
+
+
+class WorkerPool:
+    """Keep ``workers`` worker processes running and requeue jobs whose worker died."""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._processes = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # spawn rather than fork: the Streamlit server process is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        self._processes = [self._spawn(context) for _ in range(self.workers)]
+        self._thread = threading.Thread(target=self._supervise, args=(context,), name="job-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def _spawn(self, context):
+        process = context.Process(target=_worker_main, name="job-worker", daemon=True)
+        process.start()
+        return process
+
+    def _supervise(self, context):
+        while not self._stopped.wait(POLL_INTERVAL * 5):
+            self._processes = [p if p.is_alive() else self._spawn(context) for p in self._processes]
+            requeue_stale()
+
+    def stop(self):
+        self._stopped.set()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(5)
+
+    def alive(self) -> int:
+        return sum(p.is_alive() for p in self._processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(1, JOB_WORKERS))
+    args = parser.parse_args()
+
+    requeue_stale()
+    pool = WorkerPool(args.workers).start()
+    print(f"{args.workers} job workers on {JOBS_DB}; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Provider table for the LLM client, and settings for the whole app, without
+# Streamlit. Every module reads its settings through ``setting``.
+#
+# Settings are looked up in environment variables first, then in TOML
+# files: ``RA_CONFIG`` if set, then ``.streamlit/secrets.toml`` in the
+# working directory and in the home directory (the files Streamlit's
+# ``st.secrets`` reads). Extra sources, such as ``st.secrets`` itself, can
+# be registered with ``add_source``.
+#
+# The provider table defaults to ``DEFAULT_PROVIDERS``; a TOML file may
+# replace it with ``[[llm_providers]]`` tables::
+#
+#     [[llm_providers]]
+#     name = "Groq"
+#     base_url = "https://api.groq.com/openai/v1"
+#     model = "llama-3.3-70b-versatile"
+#     api_key_setting = "GROQ_API_KEY"   # or api_key = "..."
+#     rpm = 30
+
+import os
+import threading
+
+# Built-in providers; each API key is read from the setting named in api_key_setting
+DEFAULT_PROVIDERS = [
+    {"name": "Groq", "base_url": "https://api.groq.com/openai/v1",
+     "model": "llama-3.2-90b-vision-preview", "api_key_setting": "GROQ_API_KEY"},
+    {"name": "Groq", "base_url": "https://api.groq.com/openai/v1",
+     "model": "llama-3.3-70b-versatile", "api_key_setting": "GROQ_API_KEY"},
+    {"name": "Groq", "base_url": "https://api.groq.com/openai/v1",
+     "model": "deepseek-r1-distill-llama-70b", "api_key_setting": "GROQ_API_KEY"},
+    {"name": "OpenRouter", "base_url": "https://openrouter.ai/api/v1",
+     "model": "huggingfaceh4/zephyr-7b-beta", "api_key_setting": "OPENROUTER_API_KEY",
+     "headers": {"HTTP-Referer": "https://yourapp.com", "X-Title": "Multi-Agent Research Assistant"}},
+    {"name": "TogetherAI", "base_url": "https://api.together.xyz/v1",
+     "model": "meta-llama/Llama-2-70b-chat-hf", "api_key_setting": "TOGETHER_API_KEY"},
+    {"name": "Fireworks", "base_url": "https://api.fireworks.ai/inference/v1",
+     "model": "accounts/fireworks/models/llama-v2-13b-chat", "api_key_setting": "FIREWORKS_API_KEY"},
+]
+
+_lock = threading.RLock()
+_files = None
+_sources = []
+_providers = None
+
+
+def _config_paths() -> list:
+    paths = [os.environ.get("RA_CONFIG"), os.path.join(".streamlit", "secrets.toml"),
+             os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml")]
+    return [path for path in paths if path and os.path.isfile(path)]
+
+
+def _load_files() -> list:
+    global _files
+    with _lock:
+        if _files is None:
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                import tomli as tomllib
+
+            _files = []
+            for path in _config_paths():
+                with open(path, "rb") as f:
+                    _files.append(tomllib.load(f))
+        return _files
+
+
+def add_source(mapping):
+    """Also look settings up in ``mapping`` (anything with ``.get``), after env vars and files."""
+    global _providers
+    with _lock:
+        if not any(source is mapping for source in _sources):
+            _sources.append(mapping)
+            _providers = None
+
+
+def setting(name: str, default=""):
+    value = os.environ.get(name)
+    if value is not None:
+        return value
+    for source in _load_files() + list(_sources):
+        try:
+            value = source.get(name)
+        except Exception:
+            # st.secrets raises when no secrets file exists
+            continue
+        if value is not None:
+            return value
+    return default
+
+
+def _build(entry: dict) -> dict:
+    extra = dict(entry.get("headers") or {})
+    provider = {
+        "name": entry["name"],
+        "base_url": entry["base_url"].rstrip("/"),
+        "headers": lambda token, extra=extra: {"Authorization": f"Bearer {token}", **extra},
+        "token": entry.get("api_key") or setting(entry.get("api_key_setting", ""), ""),
+        "model": entry["model"],
+    }
+    for limit in ("rpm", "tpm"):
+        if entry.get(limit) is not None:
+            provider[limit] = int(entry[limit])
+    return provider
+
+
+def get_providers() -> list:
+    """The provider table, built on first use."""
+    global _providers
+    with _lock:
+        if _providers is None:
+            entries = DEFAULT_PROVIDERS
+            for source in _load_files() + list(_sources):
+                try:
+                    configured = source.get("llm_providers")
+                except Exception:
+                    continue
+                if configured:
+                    entries = configured
+                    break
+            _providers = [_build(dict(entry)) for entry in entries]
+        return _providers
+
+
+def set_providers(providers: list):
+    """Use ``providers`` (dicts in the shape ``get_providers`` returns) instead of the configured table."""
+    global _providers
+    with _lock:
+        _providers = list(providers)
+
+
+def reload():
+    """Forget loaded files and the provider table so the next lookup re-reads them."""
+    global _files, _providers
+    with _lock:
+        _files = None
+        _providers = None
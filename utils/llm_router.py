@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def provider_key(provider: dict) -> str:
+    return f"{provider['name']}:{provider['model']}"
+
+
+class ProviderError(Exception):
+    """A provider answered with a non-200 status."""
+
+    def __init__(self, provider: dict, status_code: int, text: str, retry_after: float = None):
+        super().__init__(f"{provider['name']} error: {status_code} - {text}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status_code == 429
+
+
+class _Health:
+    def __init__(self, prior_latency: float):
+        self.latency = prior_latency
+        self.success = 1.0
+        self.failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.trial_started = None
+        self.calls = 0
+        self.samples = deque(maxlen=100)
+
+
+class ProviderRouter:
+    """Process-wide provider selection shared by every session and thread.
+
+    Each provider keeps an EWMA of its latency and success rate. After
+    ``failure_threshold`` consecutive errors, or any 429, its circuit opens
+    and it is skipped for ``cooldown`` seconds; then a single trial request
+    is let through (half-open) and its outcome closes or re-opens the
+    circuit. Requests go to the closed providers with the best expected
+    latency first.
+    """
+
+    def __init__(self, providers: list, alpha: float = 0.3, failure_threshold: int = 3,
+                 cooldown: float = 30.0, max_cooldown: float = 300.0, prior_latency: float = 5.0):
+        self.providers = providers
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.prior_latency = prior_latency
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: dict) -> _Health:
+        key = provider_key(provider)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = _Health(self.prior_latency)
+        return health
+
+    def _score(self, provider: dict) -> float:
+        # Expected seconds per successful answer
+        health = self._get(provider)
+        return health.latency / max(health.success, 0.05)
+
+    def candidates(self) -> list:
+        """Providers to try for one request, best first."""
+        now = time.monotonic()
+        with self._lock:
+            usable = [p for p in self.providers if self._get(p).state == CLOSED or now >= self._get(p).open_until]
+            if usable:
+                return sorted(usable, key=self._score)
+            # Every circuit is open: try anyway, soonest to recover first
+            return sorted(self.providers, key=lambda p: self._get(p).open_until)
+
+    def begin(self, provider: dict) -> bool:
+        """Claim a provider for one attempt; False if it should be skipped."""
+        now = time.monotonic()
+        with self._lock:
+            health = self._get(provider)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN and now >= health.open_until:
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN:
+                # Only one trial at a time; a trial that never reported back is abandoned
+                if health.trial_started is None or now - health.trial_started > self.max_cooldown:
+                    health.trial_started = now
+                    return True
+                return False
+            # Open and cooling down; only reached when every circuit is open
+            return all(self._get(p).state != CLOSED for p in self.providers)
+
+    def cancel(self, provider: dict):
+        """Give back a claim from ``begin`` for an attempt that was never sent."""
+        with self._lock:
+            health = self._get(provider)
+            if health.state == HALF_OPEN:
+                health.trial_started = None
+
+    def record_success(self, provider: dict, latency: float):
+        with self._lock:
+            health = self._get(provider)
+            health.calls += 1
+            health.samples.append(latency)
+            health.latency += self.alpha * (latency - health.latency)
+            health.success += self.alpha * (1.0 - health.success)
+            health.failures = 0
+            health.state = CLOSED
+            health.trial_started = None
+
+    def record_failure(self, provider: dict, latency: float, rate_limited: bool = False, retry_after: float = None):
+        with self._lock:
+            health = self._get(provider)
+            health.calls += 1
+            health.latency += self.alpha * (latency - health.latency)
+            health.success += self.alpha * (0.0 - health.success)
+            health.failures += 1
+            if health.state == HALF_OPEN or rate_limited or health.failures >= self.failure_threshold:
+                # Back off longer each time the same provider trips again
+                trips = max(1, health.failures - self.failure_threshold + 1)
+                cooldown = retry_after if retry_after is not None else min(self.cooldown * trips, self.max_cooldown)
+                health.state = OPEN
+                health.open_until = time.monotonic() + cooldown
+                health.trial_started = None
+
+    def is_closed(self, provider: dict) -> bool:
+        with self._lock:
+            return self._get(provider).state == CLOSED
+
+    def latency_percentile(self, provider: dict, q: float):
+        """Recent successful-call latency at quantile ``q``, or None without data."""
+        with self._lock:
+            samples = sorted(self._get(provider).samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for provider in self.providers:
+                health = self._get(provider)
+                rows.append({
+                    "provider": provider_key(provider),
+                    "state": health.state,
+                    "latency_ewma": round(health.latency, 3),
+                    "success_ewma": round(health.success, 3),
+                    "consecutive_failures": health.failures,
+                    "calls": health.calls,
+                    "reopens_in": round(max(0.0, health.open_until - now), 1) if health.state == OPEN else 0.0,
+                })
+            return rows
@@ -1,96 +1,454 @@
-import streamlit as st
-import requests
-
-# Safely initialize LLM_INDEX
-if "LLM_INDEX" not in st.session_state:
-    st.session_state["LLM_INDEX"] = 0
-
-# List of LLM providers (free + open access APIs)
-LLM_PROVIDERS = [
-    {
-        "name": "Groq",
-        "base_url": "https://api.groq.com/openai/v1",
-        "headers": lambda token: {
-            "Authorization": f"Bearer {token}"
-        },
-        "token": st.secrets.get("GROQ_API_KEY", ""),
-        "model": "llama-3.2-90b-vision-preview"
-    },
-    {
-        "name": "Groq",
-        "base_url": "https://api.groq.com/openai/v1",
-        "headers": lambda token: {
-            "Authorization": f"Bearer {token}"
-        },
-        "token": st.secrets.get("GROQ_API_KEY", ""),
-        "model": "llama-3.3-70b-versatile"
-    },
-    {
-        "name": "Groq",
-        "base_url": "https://api.groq.com/openai/v1",
-        "headers": lambda token: {
-            "Authorization": f"Bearer {token}"
-        },
-        "token": st.secrets.get("GROQ_API_KEY", ""),
-        "model": "deepseek-r1-distill-llama-70b"
-    },
-    {
-        "name": "OpenRouter",
-        "base_url": "https://openrouter.ai/api/v1",
-        "headers": lambda token: {
-            "Authorization": f"Bearer {token}",
-            "HTTP-Referer": "https://yourapp.com",
-            "X-Title": "Multi-Agent Research Assistant"
-        },
-        "token": st.secrets.get("OPENROUTER_API_KEY", ""),
-        "model": "huggingfaceh4/zephyr-7b-beta"
-    },
-    {
-        "name": "TogetherAI",
-        "base_url": "https://api.together.xyz/v1",
-        "headers": lambda token: {
-            "Authorization": f"Bearer {token}"
-        },
-        "token": st.secrets.get("TOGETHER_API_KEY", ""),
-        "model": "meta-llama/Llama-2-70b-chat-hf"
-    },
-    {
-        "name": "Fireworks",
-        "base_url": "https://api.fireworks.ai/inference/v1",
-        "headers": lambda token: {
-            "Authorization": f"Bearer {token}"
-        },
-        "token": st.secrets.get("FIREWORKS_API_KEY", ""),
-        "model": "accounts/fireworks/models/llama-v2-13b-chat"
-    }
-]
+import asyncio
+import threading
+import json
+import time
+import weakref
+from utils.llm_cache import ResponseCache, make_key
+from utils.llm_config import get_providers, setting as _setting
+from utils.llm_router import ProviderRouter, ProviderError, provider_key
+from utils.rate_limit import RateLimiter, RateLimitTimeout
+from utils.singleflight import SingleFlight
+from utils.hedging import HedgeBudget, hedged
+from utils import telemetry
+
+# Provider table and settings come from env vars and TOML files through
+# utils.llm_config, so this module imports without Streamlit; pages go
+# through the utils.streamlit_llm adapter
+
+# === Optional on-disk response cache (enabled by setting LLM_CACHE_PATH) ===
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            path = _setting("LLM_CACHE_PATH")
+            if not path:
+                return None
+            _response_cache = ResponseCache(
+                path,
+                max_bytes=int(_setting("LLM_CACHE_MAX_MB", 256)) * 1024 * 1024,
+                ttl=float(_setting("LLM_CACHE_TTL_HOURS", 168)) * 3600,
+            )
+    return _response_cache
+
+# === Pooled keep-alive HTTP sessions, one per provider base_url ===
+CONNECT_TIMEOUT = float(_setting("LLM_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(_setting("LLM_READ_TIMEOUT", 15))
+POOL_SIZE = int(_setting("LLM_POOL_SIZE", 10))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(base_url: str):
+    # Shared by every Streamlit session and script thread in this process, so
+    # repeated calls to the same host reuse open TCP/TLS connections.
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[base_url] = session
+    return session
+
+# Async clients are bound to the event loop that created them
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client(base_url: str):
+    import httpx
+
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(base_url)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        clients[base_url] = client
+    return client
+
+async def aclose_async_clients():
+    # Call before the event loop shuts down to release pooled connections
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+# === Process-wide provider routing with circuit breakers ===
+BREAKER_FAILURES = int(_setting("LLM_BREAKER_FAILURES", 3))
+BREAKER_COOLDOWN = float(_setting("LLM_BREAKER_COOLDOWN", 30))
+_router = None
+_rate_limiter = None
+_rate_limiter_providers = None
+_state_lock = threading.Lock()
+
+def get_router() -> ProviderRouter:
+    # Built on first use, and again if the provider table is replaced
+    global _router
+    providers = get_providers()
+    with _state_lock:
+        if _router is None or _router.providers is not providers:
+            _router = ProviderRouter(providers, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN)
+        return _router
+
+# === Shared requests/minute and tokens/minute limits per provider ===
+# A provider entry may set its own "rpm"/"tpm"; 0 means unlimited. Set
+# LLM_RATE_LIMIT_DB to a SQLite path to share the budget across processes.
+RATE_RPM = int(_setting("LLM_RATE_RPM", 0))
+RATE_TPM = int(_setting("LLM_RATE_TPM", 0))
+QUEUE_TIMEOUT = float(_setting("LLM_QUEUE_TIMEOUT", 30))
+# Completion tokens assumed per request until the response reports real usage
+COMPLETION_TOKENS = int(_setting("LLM_COMPLETION_TOKENS", 800))
+RATE_LIMIT_DB = _setting("LLM_RATE_LIMIT_DB") or None
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter, _rate_limiter_providers
+    providers = get_providers()
+    with _state_lock:
+        if _rate_limiter is None or _rate_limiter_providers is not providers:
+            _rate_limiter = RateLimiter(
+                {provider_key(p): (p.get("rpm", RATE_RPM), p.get("tpm", RATE_TPM)) for p in providers},
+                path=RATE_LIMIT_DB,
+            )
+            _rate_limiter_providers = providers
+        return _rate_limiter
+
+def get_rate_limit_stats() -> list:
+    return get_rate_limiter().stats()
+
+def __getattr__(name):
+    # LLM_PROVIDERS, router and rate_limiter used to be built at import time
+    if name == "LLM_PROVIDERS":
+        return get_providers()
+    if name == "router":
+        return get_router()
+    if name == "rate_limiter":
+        return get_rate_limiter()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _request_tokens(prompt):
+    return len(prompt) // 4 + 1 + COMPLETION_TOKENS
+
+def _by_capacity(providers, prompt):
+    # Keep the router's order, but try providers that can take the request
+    # right away before queueing behind another's rate limit
+    tokens = _request_tokens(prompt)
+    limiter = get_rate_limiter()
+    return sorted(providers, key=lambda p: limiter.expected_wait(provider_key(p), tokens) > 0)
+
+def _queue_timeout(deadline):
+    return QUEUE_TIMEOUT if deadline is None else max(0.0, deadline - time.monotonic())
 
 def get_active_provider():
-    return LLM_PROVIDERS[st.session_state["LLM_INDEX"]]
+    # Healthiest, fastest provider right now
+    return get_router().candidates()[0]
+
+def _retry_after(headers):
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def _chat_request(provider, prompt, temperature):
+    url = f"{provider['base_url']}/chat/completions"
+    headers = provider["headers"](provider["token"])
+    data = {
+        "model": provider["model"],
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature
+    }
+    return url, headers, data
+
+def _chat_content(provider, response):
+    # (content, token usage) of a completion response
+    if response.status_code == 200:
+        body = response.json()
+        return body["choices"][0]["message"]["content"], body.get("usage") or {}
+    raise ProviderError(provider, response.status_code, response.text, _retry_after(response.headers))
+
+def _llm_span(name, provider, prompt, attempt, **attrs):
+    # One telemetry span per request sent to a provider
+    return telemetry.span("llm", name, provider=provider["name"], model=provider["model"],
+                          attempt=attempt, prompt_chars=len(prompt), **attrs)
+
+def _note_response(span, content, usage=None):
+    span["response_chars"] = len(content)
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if (usage or {}).get(field) is not None:
+            span[field] = usage[field]
+
+def _record_cache_hit(name, provider, prompt, content):
+    telemetry.record("llm", name, 0.0, provider=provider["name"], model=provider["model"], status="ok",
+                     cache_hit=True, prompt_chars=len(prompt), response_chars=len(content))
 
-def switch_to_next_provider():
-    st.session_state["LLM_INDEX"] = (st.session_state["LLM_INDEX"] + 1) % len(LLM_PROVIDERS)
-    return get_active_provider()
+def _cached_answer(cache, providers, prompt, temperature):
+    # Look in the cache under every model before sending anything: the
+    # router reorders providers by latency, so the answer may be stored
+    # under one that isn't first (or isn't a candidate) this time
+    candidates = providers + [p for p in get_providers() if p not in providers]
+    i, cached = cache.get_first([make_key(p["model"], prompt, temperature) for p in candidates])
+    return (None, None) if i is None else (candidates[i], cached)
 
-def call_llm(prompt: str):
-    for _ in range(len(LLM_PROVIDERS)):
-        provider = get_active_provider()
+def _record_failure(provider, started, error):
+    print(f"[⚠️ LLM Fail] {provider['name']}: {error}")
+    if isinstance(error, ProviderError):
+        if error.rate_limited:
+            # Queue everyone else behind the provider's cool-down instead of
+            # letting them hit the same 429
+            get_rate_limiter().penalize(provider_key(provider), 5 if error.retry_after is None else error.retry_after)
+        get_router().record_failure(provider, time.monotonic() - started, error.rate_limited, error.retry_after)
+    else:
+        get_router().record_failure(provider, time.monotonic() - started)
+
+# === Optional request hedging (enabled by setting LLM_HEDGE=1) ===
+HEDGE_ENABLED = str(_setting("LLM_HEDGE", "0")).lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(_setting("LLM_HEDGE_PERCENTILE", 0.95))
+HEDGE_MIN_DELAY = float(_setting("LLM_HEDGE_MIN_DELAY", 2))
+hedge_budget = HedgeBudget(max_ratio=float(_setting("LLM_HEDGE_MAX_RATIO", 0.1)))
+
+def get_hedge_stats() -> dict:
+    return hedge_budget.stats()
+
+def _attempt(provider, prompt, temperature, attempt=0, hedge=False, deadline=None, waited=None):
+    # waited is set when the caller already reserved rate-limit capacity
+    tokens = _request_tokens(prompt)
+    if waited is None:
+        waited = get_rate_limiter().acquire(provider_key(provider), tokens, _queue_timeout(deadline))
+    started = time.monotonic()
+    with _llm_span("call_llm", provider, prompt, attempt, hedge=hedge, queue_wait_s=round(waited, 3)) as span:
+        try:
+            url, headers, data = _chat_request(provider, prompt, temperature)
+            session = get_session(provider["base_url"])
+            response = session.post(url, json=data, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            content, usage = _chat_content(provider, response)
+        except Exception as e:
+            _record_failure(provider, started, e)
+            span["status_code"] = getattr(e, "status_code", None)
+            raise
+        _note_response(span, content, usage)
+    get_rate_limiter().settle(provider_key(provider), tokens, usage.get("total_tokens"))
+    get_router().record_success(provider, time.monotonic() - started)
+    return content
+
+def _hedged_attempt(provider, backup, prompt, temperature, attempt=0, deadline=None):
+    # Queue for the primary's rate limit before the hedge clock starts, so a
+    # provider that is only waiting for capacity doesn't trigger a backup
+    waited = get_rate_limiter().acquire(provider_key(provider), _request_tokens(prompt), _queue_timeout(deadline))
+    # Wait for the primary up to its recent latency percentile, then race a backup
+    delay = max(HEDGE_MIN_DELAY, get_router().latency_percentile(provider, HEDGE_PERCENTILE) or READ_TIMEOUT)
+
+    def send_backup():
+        try:
+            return _attempt(backup, prompt, temperature, attempt, hedge=True, deadline=time.monotonic())
+        except RateLimitTimeout:
+            # Another caller took the capacity first: nothing was sent
+            hedge_budget.refund()
+            raise
+
+    content, used_backup = hedged(
+        lambda: _attempt(provider, prompt, temperature, attempt, deadline=deadline, waited=waited),
+        send_backup if backup else None,
+        delay,
+        hedge_budget,
+        # A backup only goes out if its provider has capacity right now
+        ready=lambda: get_rate_limiter().expected_wait(provider_key(backup), _request_tokens(prompt)) == 0,
+    )
+    return (backup if used_backup else provider), content
+
+# === Identical requests already in flight are shared, not sent again ===
+inflight = SingleFlight()
+
+def get_coalesce_stats() -> dict:
+    return inflight.stats()
+
+def _inflight_key(prompt, temperature, use_cache, refresh, hedge):
+    # The provider is picked per call by the router, and identical calls made
+    # together get the same candidate order, so the model isn't part of the key.
+    # Calls only share when they would use the cache and hedge the same way.
+    return make_key("inflight", prompt, temperature, bool(use_cache), bool(refresh), hedge)
+
+def call_llm(prompt: str, temperature: float = 0.7, use_cache: bool = True, refresh: bool = False, hedge: bool = None):
+    # use_cache=False skips the response cache entirely; refresh=True ignores
+    # cached answers (e.g. a "Regenerate" button) but still stores the new one.
+    # hedge overrides LLM_HEDGE for this call. Concurrent identical calls
+    # share one request, and its result or error.
+    return inflight.do(
+        _inflight_key(prompt, temperature, use_cache, refresh, HEDGE_ENABLED if hedge is None else bool(hedge)),
+        lambda: _call_llm(prompt, temperature, use_cache, refresh, hedge),
+    )
+
+def _call_llm(prompt, temperature, use_cache, refresh, hedge):
+    cache = get_response_cache() if use_cache else None
+    hedge = HEDGE_ENABLED if hedge is None else hedge
+    providers = _by_capacity(get_router().candidates(), prompt)
+    if cache is not None and not refresh:
+        provider, cached = _cached_answer(cache, providers, prompt, temperature)
+        if cached is not None:
+            _record_cache_hit("call_llm", provider, prompt, cached)
+            return cached
+    attempt = 0
+    # Time allowed for queueing behind rate limits, across all providers tried
+    deadline = time.monotonic() + QUEUE_TIMEOUT
+    for i, provider in enumerate(providers):
+        if not get_router().begin(provider):
+            continue
         try:
-            url = f"{provider['base_url']}/chat/completions"
-            headers = provider["headers"](provider["token"])
-            data = {
-                "model": provider["model"],
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7
-            }
-
-            response = requests.post(url, json=data, headers=headers, timeout=15)
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
+            if hedge:
+                backup = next((p for p in providers[i + 1:] if get_router().is_closed(p)), None)
+                provider, content = _hedged_attempt(provider, backup, prompt, temperature, attempt, deadline)
             else:
-                raise Exception(f"{provider['name']} error: {response.status_code} - {response.text}")
+                content = _attempt(provider, prompt, temperature, attempt, deadline=deadline)
+        except RateLimitTimeout:
+            # Nothing was sent; try a provider with spare capacity
+            get_router().cancel(provider)
+            continue
+        except Exception:
+            attempt += 1
+            continue
+        if cache is not None:
+            cache.set(make_key(provider["model"], prompt, temperature), content)
+        return content
+
+    raise RuntimeError("All LLM providers failed.")
+
+async def acall_llm(prompt: str, temperature: float = 0.7, use_cache: bool = True, refresh: bool = False):
+    # Async twin of call_llm: same provider failover, cache and coalescing, but
+    # the request runs on a pooled httpx.AsyncClient instead of blocking a thread.
+    return await inflight.ado(
+        # acall_llm never hedges
+        _inflight_key(prompt, temperature, use_cache, refresh, False),
+        lambda: _acall_llm(prompt, temperature, use_cache, refresh),
+    )
+
+async def _acall_llm(prompt, temperature, use_cache, refresh):
+    cache = get_response_cache() if use_cache else None
+    providers = _by_capacity(get_router().candidates(), prompt)
+    if cache is not None and not refresh:
+        provider, cached = _cached_answer(cache, providers, prompt, temperature)
+        if cached is not None:
+            _record_cache_hit("acall_llm", provider, prompt, cached)
+            return cached
+    attempt = 0
+    deadline = time.monotonic() + QUEUE_TIMEOUT
+    for provider in providers:
+        key = make_key(provider["model"], prompt, temperature)
+        if not get_router().begin(provider):
+            continue
+        tokens = _request_tokens(prompt)
+        try:
+            waited = await get_rate_limiter().aacquire(provider_key(provider), tokens, _queue_timeout(deadline))
+        except RateLimitTimeout:
+            get_router().cancel(provider)
+            continue
+        started = time.monotonic()
+        try:
+            with _llm_span("acall_llm", provider, prompt, attempt, queue_wait_s=round(waited, 3)) as span:
+                try:
+                    url, headers, data = _chat_request(provider, prompt, temperature)
+                    client = get_async_client(provider["base_url"])
+                    response = await client.post(url, json=data, headers=headers)
+                    content, usage = _chat_content(provider, response)
+                except Exception as e:
+                    span["status_code"] = getattr(e, "status_code", None)
+                    raise
+                _note_response(span, content, usage)
+        except Exception as e:
+            _record_failure(provider, started, e)
+            attempt += 1
+            continue
+        get_rate_limiter().settle(provider_key(provider), tokens, usage.get("total_tokens"))
+        get_router().record_success(provider, time.monotonic() - started)
+        if cache is not None:
+            cache.set(key, content)
+        return content
+
+    raise RuntimeError("All LLM providers failed.")
+
+
+def _stream_chunks(lines):
+    # Parse OpenAI-style server-sent events into text deltas
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            return
+        choices = json.loads(payload).get("choices") or [{}]
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+def stream_llm(prompt: str, temperature: float = 0.7, use_cache: bool = True, refresh: bool = False):
+    """Yield the completion for ``prompt`` chunk by chunk as the provider sends it.
+
+    Provider failover only happens before the first chunk; once text has
+    been yielded a broken stream raises instead of starting over elsewhere.
+    """
+    cache = get_response_cache() if use_cache else None
+    providers = _by_capacity(get_router().candidates(), prompt)
+    if cache is not None and not refresh:
+        provider, cached = _cached_answer(cache, providers, prompt, temperature)
+        if cached is not None:
+            _record_cache_hit("stream_llm", provider, prompt, cached)
+            yield cached
+            return
+    attempt = 0
+    deadline = time.monotonic() + QUEUE_TIMEOUT
+    for provider in providers:
+        key = make_key(provider["model"], prompt, temperature)
+        if not get_router().begin(provider):
+            continue
+        try:
+            waited = get_rate_limiter().acquire(provider_key(provider), _request_tokens(prompt), _queue_timeout(deadline))
+        except RateLimitTimeout:
+            get_router().cancel(provider)
+            continue
+        started = time.monotonic()
+        chunks = []
+        # Not a with-block: the span must not stay open across yields if the
+        # consumer abandons the generator
+        span = {"provider": provider["name"], "model": provider["model"], "attempt": attempt,
+                "prompt_chars": len(prompt), "queue_wait_s": round(waited, 3), "status": "ok"}
+        try:
+            url, headers, data = _chat_request(provider, prompt, temperature)
+            data["stream"] = True
+            session = get_session(provider["base_url"])
+            with session.post(url, json=data, headers=headers, stream=True,
+                              timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                if response.status_code != 200:
+                    raise ProviderError(provider, response.status_code, response.text, _retry_after(response.headers))
+                response.encoding = "utf-8"
+                for chunk in _stream_chunks(response.iter_lines(decode_unicode=True)):
+                    if not chunks:
+                        span["first_chunk_s"] = round(time.monotonic() - started, 6)
+                    chunks.append(chunk)
+                    yield chunk
+        except GeneratorExit:
+            # The consumer stopped reading (e.g. a Streamlit rerun): neither a
+            # success nor a provider failure, but release a half-open trial
+            get_router().cancel(provider)
+            span["status"] = "cancelled"
+            _note_response(span, "".join(chunks))
+            telemetry.record("llm", "stream_llm", time.monotonic() - started, **span)
+            raise
         except Exception as e:
-            print(f"[⚠️ LLM Fail] {provider['name']}: {e}")
-            switch_to_next_provider()
+            _record_failure(provider, started, e)
+            span.update(status="error", status_code=getattr(e, "status_code", None), error=f"{type(e).__name__}: {e}"[:300])
+            telemetry.record("llm", "stream_llm", time.monotonic() - started, **span)
+            if chunks:
+                raise
+            attempt += 1
+            continue
+        _note_response(span, "".join(chunks))
+        telemetry.record("llm", "stream_llm", time.monotonic() - started, **span)
+        get_router().record_success(provider, time.monotonic() - started)
+        if cache is not None:
+            cache.set(key, "".join(chunks))
+        return
 
-    raise RuntimeError("All LLM providers failed.")
\ No newline at end of file
+    raise RuntimeError("All LLM providers failed.")
@@ -0,0 +1,99 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.llm_config import setting
+
+# Extracted text is cached on disk by content hash, shared by all sessions
+PDF_TEXT_CACHE_DIR = setting("PDF_TEXT_CACHE_DIR", ".cache/pdf_text")
+PDF_WORKERS = int(setting("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def extract_text(data: bytes) -> str:
+    # Open straight from memory; no temp file on disk
+    import fitz
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return "".join(page.get_text() for page in doc)
+
+
+class PDFError(Exception):
+    """A document that could not be read, e.g. a corrupt or encrypted upload."""
+
+
+def _extract_or_error(data: bytes):
+    # Failures are returned rather than raised so one bad file doesn't stop
+    # the rest of a batch; converted so they pickle back from the pool
+    try:
+        return extract_text(data)
+    except Exception as e:
+        return PDFError(f"{type(e).__name__}: {e}")
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(PDF_TEXT_CACHE_DIR, digest[:2], f"{digest}.txt")
+
+
+def _read_cached(digest: str):
+    try:
+        with open(_cache_path(digest), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cached(digest: str, text: str):
+    path = _cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # spawn rather than fork: the Streamlit server process is multi-threaded
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def extract_many(blobs: list) -> list:
+    """Extract text from several PDFs given as bytes, in input order.
+
+    Documents already seen (by content hash) come from the cache; the rest
+    are parsed in parallel on a shared process pool. A document that can't
+    be read gets a PDFError in its slot instead of text.
+    """
+    digests = [content_hash(data) for data in blobs]
+    texts = [_read_cached(digest) for digest in digests]
+    missing = {}
+    for i, (digest, text) in enumerate(zip(digests, texts)):
+        if text is None:
+            missing.setdefault(digest, []).append(i)
+    if not missing:
+        return texts
+
+    todo = [blobs[indexes[0]] for indexes in missing.values()]
+    if len(todo) == 1 or PDF_WORKERS <= 1:
+        results = [_extract_or_error(data) for data in todo]
+    else:
+        results = list(_get_pool().map(_extract_or_error, todo))
+
+    for (digest, indexes), text in zip(missing.items(), results):
+        if not isinstance(text, PDFError):
+            _write_cached(digest, text)
+        for i in indexes:
+            texts[i] = text
+    return texts
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+
+from utils.llm_config import setting
+
+# Embedding model used for the per-user literature index
+EMBED_MODEL_NAME = setting("RAG_EMBED_MODEL", "BAAI/bge-small-en-v1.5")
+EMBED_BATCH_SIZE = int(setting("RAG_EMBED_BATCH_SIZE", "32"))
+VECTOR_DTYPE = setting("RAG_VECTOR_DTYPE", "float16")
+CHUNK_SIZE = int(setting("RAG_CHUNK_SIZE", "512"))
+CHUNK_OVERLAP = int(setting("RAG_CHUNK_OVERLAP", "64"))
+# Rewrite the vector file once replaced documents leave this share of rows dead
+COMPACT_RATIO = float(setting("RAG_COMPACT_RATIO", "0.3"))
+
+_embed_model = None
+_splitter = None
+_stores = {}
+_lock = threading.Lock()
+
+
+def get_embed_model():
+    # Loading the HuggingFace model is slow; do it once per process
+    global _embed_model
+    with _lock:
+        if _embed_model is None:
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+            _embed_model = HuggingFaceEmbedding(model_name=EMBED_MODEL_NAME, embed_batch_size=EMBED_BATCH_SIZE)
+    return _embed_model
+
+
+def _split(text: str) -> list:
+    global _splitter
+    with _lock:
+        if _splitter is None:
+            from llama_index.core.node_parser import SentenceSplitter
+
+            _splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return [chunk for chunk in _splitter.split_text(text) if chunk.strip()]
+
+
+def get_store(index_dir: str):
+    """The MmapVectorStore in ``index_dir``, opened once per process."""
+    from utils.vector_store import MmapVectorStore
+
+    key = os.path.abspath(index_dir)
+    with _lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = MmapVectorStore(index_dir, dtype=VECTOR_DTYPE)
+    return store
+
+
+def has_index(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(index_dir, "meta.sqlite")) and len(get_store(index_dir)) > 0
+
+
+def embed_texts(texts: list, batch_size: int = None) -> list:
+    """Embed ``texts`` in batches of ``batch_size`` (RAG_EMBED_BATCH_SIZE by default)."""
+    model = get_embed_model()
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(model.get_text_embedding_batch(texts[start:start + batch_size]))
+    return vectors
+
+
+def sync_documents(index_dir: str, documents: list) -> list:
+    """Bring the index in ``index_dir`` up to date with ``documents``.
+
+    ``documents`` is a list of ``(doc_id, text, metadata)`` tuples. Only
+    documents that are new, or whose text or metadata changed since they
+    were last indexed, are chunked and embedded. Returns the ids of the
+    documents that were (re)indexed.
+    """
+    store = get_store(index_dir)
+    changed = []
+    for doc_id, text, metadata in documents:
+        payload = json.dumps([text, metadata], sort_keys=True, ensure_ascii=False)
+        doc_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        if store.document_hash(doc_id) == doc_hash:
+            continue
+        chunks = _split(text)
+        if not chunks:
+            continue
+        store.replace_document(doc_id, doc_hash, embed_texts(chunks), chunks, metadata)
+        changed.append(doc_id)
+    dead = store.tombstones() if changed else 0
+    if dead and dead >= COMPACT_RATIO * (dead + len(store)):
+        store.compact()
+    return changed
+
+
+def search(index_dir: str, query: str, top_k: int = 5) -> list:
+    """Top-k chunks for ``query`` as ``(score, metadata, text)`` tuples."""
+    query_vector = get_embed_model().get_query_embedding(query)
+    return get_store(index_dir).search(query_vector, top_k)
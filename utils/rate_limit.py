@@ -0,0 +1,229 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+
+class RateLimitTimeout(Exception):
+    """The wait for a provider's rate limit would run past the caller's deadline."""
+
+    def __init__(self, key: str, wait: float):
+        super().__init__(f"{key}: rate limit wait of {wait:.1f}s exceeds the deadline")
+        self.key = key
+        self.wait = wait
+
+
+class _MemoryBuckets:
+    # Bucket levels for this process only
+    def __init__(self):
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def update(self, names: list, fn):
+        with self._lock:
+            levels = {name: self._levels.get(name) for name in names}
+            result, levels = fn(levels)
+            self._levels.update(levels)
+            return result
+
+    def peek(self, names: list) -> dict:
+        with self._lock:
+            return {name: self._levels.get(name) for name in names}
+
+
+class _SqliteBuckets:
+    # Bucket levels shared by every process using the same file; BEGIN
+    # IMMEDIATE serializes the read-modify-write across processes
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn, names: list) -> dict:
+        levels = {name: None for name in names}
+        for name, level, updated in conn.execute(
+            f"SELECT name, level, updated FROM buckets WHERE name IN ({','.join('?' * len(names))})", names
+        ):
+            levels[name] = (level, updated)
+        return levels
+
+    def update(self, names: list, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result, levels = fn(self._read(conn, names))
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                [(name, level, updated) for name, (level, updated) in levels.items()],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def peek(self, names: list) -> dict:
+        # A plain read: WAL readers don't wait for, or block, the write lock
+        return self._read(self._conn(), names)
+
+
+class RateLimiter:
+    """Requests/minute and tokens/minute token buckets per provider.
+
+    ``limits`` maps a provider key to ``(rpm, tpm)``; 0 or None means no
+    limit. A caller reserves capacity up front and is told how long to wait
+    for it, so callers are served in the order they arrived. Buckets may go
+    negative; a newcomer waits until everyone ahead of it is paid for.
+    A wait longer than the caller's deadline reserves nothing and raises
+    RateLimitTimeout. With ``path`` the bucket levels live in a SQLite file,
+    so several worker processes share one budget.
+    """
+
+    def __init__(self, limits: dict, path: str = None):
+        self.limits = {key: (rpm or 0, tpm or 0) for key, (rpm, tpm) in limits.items()}
+        self._buckets = _SqliteBuckets(path) if path else _MemoryBuckets()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _stat(self, key: str) -> dict:
+        stat = self._stats.get(key)
+        if stat is None:
+            stat = self._stats[key] = {"queued": 0, "requests": 0, "waits": 0, "waited_s": 0.0, "max_wait_s": 0.0, "timeouts": 0}
+        return stat
+
+    def _buckets_for(self, key: str, tokens: int) -> list:
+        # [(bucket name, capacity per minute, amount to take)]
+        rpm, tpm = self.limits.get(key, (0, 0))
+        buckets = []
+        if rpm:
+            buckets.append((f"{key}:rpm", rpm, 1))
+        if tpm:
+            # A request bigger than a whole minute's budget still gets through eventually
+            buckets.append((f"{key}:tpm", tpm, min(tokens, tpm)))
+        return buckets
+
+    def _wait(self, buckets: list, levels: dict, now: float):
+        # (seconds until every bucket covers its amount, bucket levels refilled up to now)
+        current = {}
+        wait = 0.0
+        for name, capacity, amount in buckets:
+            level, updated = levels[name] or (capacity, now)
+            level = min(capacity, level + (now - updated) * capacity / 60.0)
+            current[name] = level
+            wait = max(wait, (amount - level) * 60.0 / capacity)
+        return wait, current
+
+    def _reserve(self, key: str, tokens: int, timeout: float) -> float:
+        buckets = self._buckets_for(key, tokens)
+        if not buckets:
+            return 0.0
+
+        def take(levels):
+            now = time.time()
+            wait, current = self._wait(buckets, levels, now)
+            if wait > timeout:
+                return wait, {}
+            return wait, {name: (current[name] - amount, now) for name, _, amount in buckets}
+
+        wait = self._buckets.update([name for name, _, _ in buckets], take)
+        if wait > timeout:
+            with self._lock:
+                self._stat(key)["timeouts"] += 1
+            raise RateLimitTimeout(key, wait)
+        return max(0.0, wait)
+
+    def expected_wait(self, key: str, tokens: int = 0) -> float:
+        """Seconds a request to ``key`` would queue right now, without reserving anything."""
+        buckets = self._buckets_for(key, tokens)
+        if not buckets:
+            return 0.0
+        wait, _ = self._wait(buckets, self._buckets.peek([name for name, _, _ in buckets]), time.time())
+        return max(0.0, wait)
+
+    def _begin_wait(self, key: str, wait: float):
+        with self._lock:
+            stat = self._stat(key)
+            stat["requests"] += 1
+            if wait > 0:
+                stat["queued"] += 1
+                stat["waits"] += 1
+                stat["waited_s"] += wait
+                stat["max_wait_s"] = max(stat["max_wait_s"], wait)
+
+    def _end_wait(self, key: str, wait: float):
+        if wait > 0:
+            with self._lock:
+                self._stat(key)["queued"] -= 1
+
+    def acquire(self, key: str, tokens: int = 0, timeout: float = 60.0) -> float:
+        """Block until ``key`` may send a request of ``tokens``; returns the seconds waited."""
+        wait = self._reserve(key, tokens, timeout)
+        self._begin_wait(key, wait)
+        try:
+            if wait > 0:
+                time.sleep(wait)
+        finally:
+            self._end_wait(key, wait)
+        return wait
+
+    async def aacquire(self, key: str, tokens: int = 0, timeout: float = 60.0) -> float:
+        """``acquire`` for coroutines: waits on the event loop instead of blocking the thread."""
+        wait = self._reserve(key, tokens, timeout)
+        self._begin_wait(key, wait)
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+        finally:
+            self._end_wait(key, wait)
+        return wait
+
+    def settle(self, key: str, estimated: int, actual: int):
+        """Correct the tokens/minute bucket once the real usage of a request is known."""
+        _, tpm = self.limits.get(key, (0, 0))
+        if not tpm or actual is None or actual == estimated:
+            return
+        name = f"{key}:tpm"
+
+        def adjust(levels):
+            now = time.time()
+            level, updated = levels[name] or (tpm, now)
+            level = min(tpm, level + (now - updated) * tpm / 60.0)
+            return None, {name: (min(tpm, level - (actual - estimated)), now)}
+
+        self._buckets.update([name], adjust)
+
+    def penalize(self, key: str, seconds: float):
+        """After a 429, hold back requests to ``key`` for ``seconds``."""
+        rpm, _ = self.limits.get(key, (0, 0))
+        if not rpm or not seconds:
+            return
+        name = f"{key}:rpm"
+
+        def drain(levels):
+            now = time.time()
+            level, updated = levels[name] or (rpm, now)
+            level = min(rpm, level + (now - updated) * rpm / 60.0)
+            return None, {name: (min(level, 1 - seconds * rpm / 60.0), now)}
+
+        self._buckets.update([name], drain)
+
+    def stats(self) -> list:
+        with self._lock:
+            rows = []
+            for key, (rpm, tpm) in self.limits.items():
+                stat = dict(self._stat(key))
+                stat["avg_wait_s"] = round(stat["waited_s"] / stat["waits"], 3) if stat["waits"] else 0.0
+                stat["waited_s"] = round(stat["waited_s"], 3)
+                stat["max_wait_s"] = round(stat["max_wait_s"], 3)
+                rows.append({"provider": key, "rpm": rpm, "tpm": tpm, **stat})
+            return rows
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait and get the same result, or the same exception.
+    Nothing is remembered once the call finishes, so this only covers the
+    window before a response exists; caching is a separate layer.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        # asyncio futures are bound to their event loop
+        self._async_calls = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """``do`` for coroutine functions; shares calls among tasks on the same event loop.
+
+        The shared call runs as its own task, so a caller being cancelled
+        doesn't cancel it for the others; it is only cancelled once every
+        caller waiting on it has been.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._async_calls.setdefault(loop, {})
+            call = calls.get(key)
+            if call is None:
+                call = calls[key] = _AsyncCall(loop.create_task(fn()))
+                call.task.add_done_callback(lambda _: self._forget(calls, key, call))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            with self._lock:
+                abandoned = call.waiters == 1
+            if abandoned:
+                call.task.cancel()
+            raise
+        finally:
+            with self._lock:
+                call.waiters -= 1
+
+    def _forget(self, calls, key, call):
+        with self._lock:
+            if calls.get(key) is call:
+                del calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls) + sum(len(calls) for calls in self._async_calls.values())
+            total = self.executed + self.coalesced
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": in_flight,
+                "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            }
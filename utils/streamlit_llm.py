@@ -0,0 +1,16 @@
+# Streamlit side of the LLM client: the same functions as utils.model_utils,
+# plus st.secrets as a settings source (e.g. API keys entered in the
+# Streamlit Cloud dashboard rather than in a secrets.toml next to the app)
+import streamlit as st
+
+from utils import llm_config
+
+llm_config.add_source(st.secrets)
+
+from utils.model_utils import (  # noqa: E402
+    call_llm,
+    stream_llm,
+    get_coalesce_stats,
+    get_hedge_stats,
+    get_rate_limit_stats,
+)
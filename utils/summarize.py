@@ -0,0 +1,118 @@
+import hashlib
+
+from utils.concurrency import map_bounded
+from utils.model_utils import call_llm
+from utils.llm_config import setting
+
+# Token budget per chunk sent to the map step, and how many run at once
+CHUNK_TOKENS = int(setting("SUMMARY_CHUNK_TOKENS", "3000"))
+MAP_WORKERS = int(setting("SUMMARY_MAP_WORKERS", "4"))
+
+# Bump when map_prompt/combine_prompt change so cached chunk notes are redone
+CHUNK_PROMPT_VERSION = "v1"
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+def split_into_chunks(text: str, max_tokens: int = None) -> list:
+    """Split ``text`` on line boundaries into pieces of at most ``max_tokens``."""
+    max_chars = (max_tokens or CHUNK_TOKENS) * 4
+    chunks = []
+    current = []
+    size = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # A single line longer than the budget is cut into fixed windows
+        for piece in (line[i:i + max_chars] for i in range(0, len(line), max_chars)):
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def map_prompt(chunk: str, part: int, parts: int) -> str:
+    return f"""You are an academic research assistant. The following is part {part} of {parts} of a research paper.
+Write concise notes on what this part contains. Keep every concrete detail about:
+- Research questions, theory and hypotheses
+- Methodology: studies, participants, materials, measures
+- Findings, including effect directions, moderators and mediators
+- Implications and stated contributions
+
+Skip references, acknowledgements and boilerplate. Do not speculate beyond the text.
+
+Paper Text (part {part} of {parts}):
+{chunk}
+"""
+
+
+def combine_prompt(notes: str) -> str:
+    return f"""You are an academic research assistant. Merge the following consecutive notes on one research paper into a single set of notes.
+Keep every concrete detail about research questions, theory, methodology, findings, implications and contributions. Remove repetition.
+
+Notes:
+{notes}
+"""
+
+
+def _cached_call(prompt: str, store) -> str:
+    if store is None:
+        return call_llm(prompt).strip()
+    key = "chunk:" + hashlib.sha256(f"{CHUNK_PROMPT_VERSION}\n{prompt}".encode("utf-8")).hexdigest()
+    cached = store.get(key)
+    if cached is not None:
+        return cached
+    result = call_llm(prompt).strip()
+    store.set(key, result)
+    return result
+
+
+def condense(text: str, store=None, max_tokens: int = None, max_workers: int = None) -> tuple:
+    """Reduce a full paper to input that fits one summary prompt.
+
+    Returns ``(content, is_notes)``. Short papers come back unchanged.
+    Longer ones are split into token-bounded chunks and summarized
+    concurrently (map). Then neighbouring notes are merged until they fit
+    the budget (reduce). Every map/merge result is cached in ``store`` (any
+    object with ``get``/``set``), so a re-run only repeats the final
+    summary.
+    """
+    max_tokens = max_tokens or CHUNK_TOKENS
+    max_workers = max_workers or MAP_WORKERS
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+
+    chunks = split_into_chunks(text, max_tokens)
+    notes = map_bounded(
+        lambda item: _cached_call(map_prompt(item[1], item[0] + 1, len(chunks)), store),
+        list(enumerate(chunks)),
+        max_workers=max_workers,
+    )
+
+    # Merge neighbouring notes until everything fits in one prompt
+    while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > max_tokens:
+        groups = []
+        current = []
+        for note in notes:
+            if current and estimate_tokens("\n\n".join(current + [note])) > max_tokens:
+                groups.append(current)
+                current = []
+            current.append(note)
+        groups.append(current)
+        if len(groups) == len(notes):
+            # Every note is already at the budget; pair them up to make progress
+            groups = [notes[i:i + 2] for i in range(0, len(notes), 2)]
+        notes = map_bounded(
+            lambda group: group[0] if len(group) == 1 else _cached_call(combine_prompt("\n\n".join(group)), store),
+            groups,
+            max_workers=max_workers,
+        )
+    return "\n\n".join(notes), True
@@ -0,0 +1,172 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from utils.llm_config import setting
+
+# Spans are appended to TELEMETRY_PATH as JSON lines so the Metrics page can
+# see runs from every process (app, batch CLI, benchmarks); set it empty to
+# keep them in memory only
+TELEMETRY_PATH = setting("TELEMETRY_PATH", ".cache/telemetry.jsonl")
+TELEMETRY_MAX_MB = float(setting("TELEMETRY_MAX_MB", "50"))
+MAX_SPANS = int(setting("TELEMETRY_MAX_SPANS", "5000"))
+
+# Latency histogram buckets in seconds, for the Prometheus export
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+_spans = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+# Attributes (run, node) inherited by every span opened underneath
+_context = contextvars.ContextVar("telemetry_context", default={})
+
+
+@contextmanager
+def context(**attrs):
+    """Tag every span recorded inside the block with ``attrs``."""
+    token = _context.set({**_context.get(), **attrs})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current(name: str, default=None):
+    return _context.get().get(name, default)
+
+
+def _write(record: dict):
+    if not TELEMETRY_PATH:
+        return
+    os.makedirs(os.path.dirname(TELEMETRY_PATH) or ".", exist_ok=True)
+    if os.path.exists(TELEMETRY_PATH) and os.path.getsize(TELEMETRY_PATH) > TELEMETRY_MAX_MB * 1024 * 1024:
+        # Keep one rotated file so a long-running app doesn't fill the disk
+        os.replace(TELEMETRY_PATH, TELEMETRY_PATH + ".1")
+    with open(TELEMETRY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def record(kind: str, name: str, duration: float, **attrs) -> dict:
+    """Store a finished span. ``kind`` is ``"node"`` or ``"llm"``."""
+    span = {
+        "id": uuid.uuid4().hex[:16],
+        "kind": kind,
+        "name": name,
+        "ts": time.time() - duration,
+        "duration_s": round(duration, 6),
+        **_context.get(),
+        **attrs,
+    }
+    with _lock:
+        _spans.append(span)
+        try:
+            _write(span)
+        except OSError:
+            pass
+    return span
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """Time the block as a span; update the yielded dict to add attributes.
+
+    An exception marks the span ``status="error"`` and is re-raised.
+    """
+    attrs.setdefault("status", "ok")
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["status"] = "error"
+        attrs.setdefault("error", f"{type(e).__name__}: {e}"[:300])
+        raise
+    finally:
+        record(kind, name, time.perf_counter() - started, **attrs)
+
+
+def recent_spans(limit: int = None) -> list:
+    """Latest spans, oldest first: from TELEMETRY_PATH if set, else this process's."""
+    limit = limit or MAX_SPANS
+    if TELEMETRY_PATH and os.path.exists(TELEMETRY_PATH):
+        with _lock, open(TELEMETRY_PATH, encoding="utf-8") as f:
+            lines = deque(f, maxlen=limit)
+        spans = []
+        for line in lines:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue
+        return spans
+    with _lock:
+        return list(_spans)[-limit:]
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+        if TELEMETRY_PATH and os.path.exists(TELEMETRY_PATH):
+            os.remove(TELEMETRY_PATH)
+
+
+def to_jsonl(spans: list) -> str:
+    return "".join(json.dumps(s, ensure_ascii=False, default=str) + "\n" for s in spans)
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram(lines: list, metric: str, groups: dict):
+    lines.append(f"# TYPE {metric} histogram")
+    for labels, durations in sorted(groups.items()):
+        labels = dict(labels)
+        for bound in BUCKETS:
+            count = sum(1 for d in durations if d <= bound)
+            lines.append(f"{metric}_bucket{_labels(**labels, le=bound)} {count}")
+        lines.append(f"{metric}_bucket{_labels(**labels, le='+Inf')} {len(durations)}")
+        lines.append(f"{metric}_sum{_labels(**labels)} {sum(durations):.6f}")
+        lines.append(f"{metric}_count{_labels(**labels)} {len(durations)}")
+
+
+def _counter(lines: list, metric: str, counts: dict):
+    lines.append(f"# TYPE {metric} counter")
+    for labels, value in sorted(counts.items()):
+        lines.append(f"{metric}{_labels(**dict(labels))} {value}")
+
+
+def to_prometheus(spans: list) -> str:
+    """Aggregate ``spans`` into Prometheus text exposition format."""
+    llm_latency, node_latency = {}, {}
+    calls, tokens, retries = {}, {}, {}
+    for s in spans:
+        if s.get("kind") == "llm":
+            labels = (("model", s.get("model", "")), ("provider", s.get("provider", "")))
+            status = "cache_hit" if s.get("cache_hit") else s.get("status", "ok")
+            calls[labels + (("status", status),)] = calls.get(labels + (("status", status),), 0) + 1
+            if s.get("cache_hit"):
+                continue
+            llm_latency.setdefault(labels, []).append(s["duration_s"])
+            for kind in ("prompt", "completion"):
+                if s.get(f"{kind}_tokens"):
+                    key = labels + (("type", kind),)
+                    tokens[key] = tokens.get(key, 0) + s[f"{kind}_tokens"]
+            if s.get("attempt"):
+                retries[labels] = retries.get(labels, 0) + 1
+        elif s.get("kind") == "node":
+            node_latency.setdefault((("node", s["name"]), ("status", s.get("status", "ok"))), []).append(s["duration_s"])
+
+    lines = []
+    _histogram(lines, "ra_llm_request_duration_seconds", llm_latency)
+    _counter(lines, "ra_llm_requests_total", calls)
+    _counter(lines, "ra_llm_tokens_total", tokens)
+    _counter(lines, "ra_llm_retries_total", retries)
+    _histogram(lines, "ra_node_duration_seconds", node_latency)
+    return "\n".join(lines) + "\n"
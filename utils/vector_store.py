@@ -0,0 +1,243 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class MmapVectorStore:
+    """Append-only embedding matrix on disk with a SQLite sidecar.
+
+    Vectors live in ``vectors.bin`` as a raw row-major float16/float32
+    matrix that is memory-mapped for search, so every session and process
+    reading the same library shares one copy in the OS page cache. Row ids,
+    chunk text and metadata live in ``meta.sqlite``. Appends write only the
+    new rows at the end of the file; replaced documents are tombstoned and
+    reclaimed by ``compact()``, which writes a new, version-named file that
+    the sidecar switches to when the compaction commits.
+    """
+
+    SEARCH_BLOCK_ROWS = 8192
+
+    def __init__(self, directory: str, dtype: str = "float16"):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.meta_path = os.path.join(directory, "meta.sqlite")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._view = None
+        self._view_version = None
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, hash TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id);
+        """)
+        stored = self._setting("dtype")
+        if stored is not None:
+            self.dtype = np.dtype(stored)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.meta_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _setting(self, key):
+        row = self._conn().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def dim(self):
+        value = self._setting("dim")
+        return int(value) if value is not None else None
+
+    def _vectors_path(self):
+        # The matrix file for the snapshot being read; compact() moves to a new one
+        return os.path.join(self.directory, self._setting("vectors_file") or "vectors.bin")
+
+    def _version(self):
+        # Bumped on every write so readers know to refresh their view
+        value = self._setting("version")
+        return int(value) if value is not None else 0
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM chunks WHERE deleted = 0").fetchone()[0]
+
+    def document_hash(self, doc_id: str):
+        row = self._conn().execute("SELECT hash FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def replace_document(self, doc_id: str, doc_hash: str, vectors, texts: list, metadata: dict):
+        """Store ``vectors`` (one row per chunk in ``texts``) as the current version of ``doc_id``."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("vectors must be a 2-D array with one row per text")
+        # Normalize so a dot product is cosine similarity
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.maximum(norms, 1e-12)).astype(self.dtype)
+
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes SQLite's write lock, which also serializes
+        # appends to vectors.bin across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dim = self.dim
+            if dim is None:
+                dim = vectors.shape[1]
+                conn.execute("INSERT INTO settings VALUES ('dim', ?)", (str(dim),))
+                conn.execute("INSERT OR REPLACE INTO settings VALUES ('dtype', ?)", (self.dtype.name,))
+            elif vectors.shape[1] != dim:
+                raise ValueError(f"expected {dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            start = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+            vectors_path = self._vectors_path()
+            mode = "r+b" if os.path.exists(vectors_path) else "wb"
+            with open(vectors_path, mode) as f:
+                # Rows past the committed count are leftovers of an interrupted write
+                f.seek(start * dim * self.dtype.itemsize)
+                f.write(vectors.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+            conn.execute("UPDATE chunks SET deleted = 1 WHERE doc_id = ?", (doc_id,))
+            meta_json = json.dumps(metadata)
+            conn.executemany(
+                "INSERT INTO chunks (row, doc_id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, doc_id, text, meta_json) for i, text in enumerate(texts)],
+            )
+            conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (doc_id, doc_hash))
+            conn.execute("INSERT OR REPLACE INTO settings VALUES ('version', ?)", (str(self._version() + 1),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _current_view(self):
+        # (memmap, alive mask) for the committed rows, re-mapped only after
+        # writes; call it inside a read transaction so the rows match the file
+        version = self._version()
+        with self._lock:
+            if self._view is None or self._view_version != version:
+                conn = self._conn()
+                dim = self.dim
+                rows = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+                if dim is None or rows == 0:
+                    self._view = (None, None)
+                else:
+                    matrix = np.memmap(self._vectors_path(), dtype=self.dtype, mode="r", shape=(rows, dim))
+                    alive = np.zeros(rows, dtype=bool)
+                    live_rows = [r for (r,) in conn.execute("SELECT row FROM chunks WHERE deleted = 0")]
+                    alive[live_rows] = True
+                    self._view = (matrix, alive)
+                self._view_version = version
+            return self._view
+
+    def search(self, query, top_k: int = 5) -> list:
+        """Top-k rows by cosine similarity as ``(score, metadata, text)`` tuples."""
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        conn = self._conn()
+        while True:
+            # One read transaction for the view and the text lookups, so a
+            # compaction committed meanwhile can't renumber the rows under us
+            conn.execute("BEGIN")
+            try:
+                return self._search(conn, query, top_k)
+            except FileNotFoundError:
+                # Our snapshot's matrix file was just replaced by a compaction
+                continue
+            finally:
+                conn.execute("COMMIT")
+
+    def _search(self, conn, query, top_k):
+        matrix, alive = self._current_view()
+        if matrix is None or not alive.any():
+            return []
+
+        # Score in blocks; float16 rows are widened into one reused float32
+        # buffer so memory use stays flat however large the library gets
+        scores = np.empty(len(matrix), dtype=np.float32)
+        scratch = None if matrix.dtype == np.float32 else np.empty((self.SEARCH_BLOCK_ROWS, matrix.shape[1]), np.float32)
+        for start in range(0, len(matrix), self.SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + self.SEARCH_BLOCK_ROWS]
+            if scratch is not None:
+                np.copyto(scratch[:len(block)], block)
+                block = scratch[:len(block)]
+            scores[start:start + len(block)] = block @ query
+        scores[~alive] = -np.inf
+
+        k = min(top_k, int(alive.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            text, meta_json = conn.execute("SELECT text, metadata FROM chunks WHERE row = ?", (int(row),)).fetchone()
+            results.append((float(scores[row]), json.loads(meta_json), text))
+        return results
+
+    def tombstones(self) -> int:
+        """Rows left behind by replaced documents, reclaimed by ``compact()``."""
+        return self._conn().execute("SELECT COUNT(*) FROM chunks WHERE deleted = 1").fetchone()[0]
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Read rows under the write lock, so an append committed by
+            # another process just before can't be left out
+            dim = self.dim
+            rows = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+            if dim is None or rows == 0:
+                conn.execute("COMMIT")
+                return
+            matrix = np.memmap(self._vectors_path(), dtype=self.dtype, mode="r", shape=(rows, dim))
+            alive = np.zeros(rows, dtype=bool)
+            alive[[r for (r,) in conn.execute("SELECT row FROM chunks WHERE deleted = 0")]] = True
+            keep = np.flatnonzero(alive)
+            # Readers keep using the old file until the new name is committed
+            version = self._version() + 1
+            new_name = f"vectors.{version}.bin"
+            new_path = os.path.join(self.directory, new_name)
+            with open(new_path, "wb") as f:
+                for start in range(0, len(keep), self.SEARCH_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(matrix[keep[start:start + self.SEARCH_BLOCK_ROWS]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            del matrix
+            conn.execute("DELETE FROM chunks WHERE deleted = 1")
+            conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(keep) if new != old],
+            )
+            conn.execute("INSERT OR REPLACE INTO settings VALUES ('vectors_file', ?)", (new_name,))
+            conn.execute("INSERT OR REPLACE INTO settings VALUES ('version', ?)", (str(version),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._view = None
+        # Earlier files; a reader still mapping one keeps its data until it
+        # unmaps (where the OS refuses, the next compaction retries)
+        for path in glob.glob(os.path.join(self.directory, "vectors*.bin")):
+            if os.path.basename(path) != new_name:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass